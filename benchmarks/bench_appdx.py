@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmarks the extraction of the BibDesk appendix against the previous,
+line-by-line implementation, on a synthetic 100k-entry library.
+
+With citationweb installed, run:  python benchmarks/bench_appdx.py
+"""
+
+import os
+import tempfile
+import timeit
+
+from synth import write_library
+
+from citationweb.parsing import extract_appdx, open_buffer
+
+# Local constants
+START_STR = '@comment{BibDesk'
+REPEAT = 5
+
+# -----------------------------------------------------------------------------
+
+def line_by_line(path: str, start_str: str) -> str:
+    """The previous implementation of Bibliography._load_appdx"""
+    appdx = ''
+    appdx_reached = False
+
+    with open(path) as bibfile:
+        for line in bibfile:
+            if not appdx_reached:
+                if line.startswith(start_str):
+                    appdx_reached = True
+
+            if appdx_reached:
+                appdx += line
+
+    return appdx
+
+def reverse_scan(path: str, start_str: str) -> str:
+    """The current implementation, memory-mapping the file"""
+    with open_buffer(path) as buf:
+        return extract_appdx(buf, start_str)
+
+# -----------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "synth.bib")
+        write_library(path, num_entries=100000, num_groups=2000)
+
+        print("Library size:  {:.1f} MB".format(os.path.getsize(path) / 1e6))
+        assert line_by_line(path, START_STR) == reverse_scan(path, START_STR)
+
+        for func in (line_by_line, reverse_scan):
+            times = timeit.repeat(lambda: func(path, START_STR),
+                                  repeat=REPEAT, number=1)
+            print("{:<14s} {:8.2f} ms  (best of {})"
+                  "".format(func.__name__ + ":", min(times) * 1e3, REPEAT))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmarks saving a synthetic 100k-entry library, in which a single entry
+was modified: Bibliography.save, which copies all unmodified parts of the
+file verbatim, against writing all entries with the streaming writer, and
+against formatting the whole output in memory first and writing it at once.
+Saving in place additionally derives the entry index of the saved file.
+
+Reports throughput and the peak memory allocated while saving, as traced
+by tracemalloc (which slows down all variants alike). The entry index that
+Bibliography.save relies on is recorded while loading; building it from
+scratch is timed separately.
+
+With citationweb installed, run:  python benchmarks/bench_save.py
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from synth import write_library
+
+from citationweb import Bibliography
+from citationweb.index import EntryIndex
+from citationweb.writing import format_entry, write_bibfile
+
+# Local constants
+NUM_ENTRIES = 100000
+MODIFIED = 'Author123451975'
+
+# -----------------------------------------------------------------------------
+
+def preserving(bib: Bibliography, path: str):
+    """The current implementation"""
+    bib.save(path)
+
+def in_place(bib: Bibliography, path: str):
+    """The current implementation, overwriting the loaded file"""
+    bib.mark_modified(MODIFIED)
+    bib.save()
+
+def streaming(bib: Bibliography, path: str):
+    """Writes all entries one at a time"""
+    write_bibfile(path, bib.data.entries, appdx=bib.appdx, sort_fields=True)
+
+def in_memory(bib: Bibliography, path: str):
+    """Formats the whole output as a single string before writing it"""
+    output = "\n".join(format_entry(key, entry, sort_fields=True)
+                       for key, entry in bib.data.entries.items())
+    output += "\n" + bib.appdx
+
+    with open(path, 'w') as f:
+        f.write(output)
+
+def measure(func, bib: Bibliography, path: str) -> tuple:
+    """Returns the time in seconds and the peak traced memory in bytes"""
+    start = time.perf_counter()
+    func(bib, path)
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(bib, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return duration, peak
+
+# -----------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = os.path.join(tmpdir, "synth.bib")
+        write_library(src, num_entries=NUM_ENTRIES)
+        size = os.path.getsize(src)
+
+        print("Library size:  {:.1f} MB".format(size / 1e6))
+
+        start = time.perf_counter()
+        EntryIndex(src, persist=False)
+        print("Building the index: {:.2f} s"
+              "".format(time.perf_counter() - start))
+
+        bib = Bibliography(src, creator='BibDesk', parser='fast',
+                           use_cache=False)
+        bib.data.entries[MODIFIED].fields['Year'] = "1976"
+
+        for func in (in_memory, streaming, preserving, in_place):
+            path = (src if func is in_place
+                    else os.path.join(tmpdir, func.__name__ + ".bib"))
+            duration, peak = measure(func, bib, path)
+
+            print("{:<11s} {:7.2f} s  {:7.1f} MB/s  peak {:7.1f} MB"
+                  "".format(func.__name__ + ":", duration,
+                            os.path.getsize(path) / 1e6 / duration,
+                            peak / 1e6))
@@ -0,0 +1,66 @@
+"""Generates synthetic BibDesk libraries for benchmarking"""
+
+import random
+
+# Local constants
+JOURNALS = ["Naturwissenschaften", "Physical Review E", "Nature",
+            "Journal of Theoretical Biology", "PLoS ONE", "Science"]
+KEYWORDS = ["Evolution", "Self-Organisation", "Networks", "Ecology",
+            "Complexity", "Game Theory"]
+
+# -----------------------------------------------------------------------------
+
+def write_library(path: str, num_entries: int=100000, num_groups: int=200,
+                  group_size: int=500, seed: int=42):
+    """Writes a synthetic BibDesk library with the given number of entries
+    and a static groups appendix with the given number of groups.
+
+    Args:
+        path (str): Where to write the library to
+        num_entries (int, optional): The number of entries
+        num_groups (int, optional): The number of static groups
+        group_size (int, optional): The number of keys per group
+        seed (int, optional): The seed of the random number generator
+    """
+    rng = random.Random(seed)
+    keys = ["Author{}{}".format(i, 1950 + i % 70) for i in range(num_entries)]
+
+    with open(path, 'w') as f:
+        f.write("%% This BibDesk file was generated for benchmarking\n\n")
+
+        for i, key in enumerate(keys):
+            f.write("@article{{{key},\n"
+                    "\tAuthor = {{Author{i}, First and Other, Second}},\n"
+                    "\tDoi = {{10.1000/synth.{i}}},\n"
+                    "\tJournal = {{{journal}}},\n"
+                    "\tKeywords = {{{keywords}}},\n"
+                    "\tPages = {{{i}--{j}}},\n"
+                    "\tTitle = {{On the {{Synthetic}} Entry Number {i}}},\n"
+                    "\tVolume = {{{volume}}},\n"
+                    "\tYear = {{{year}}}}}\n\n"
+                    "".format(key=key, i=i, j=i + 10,
+                              journal=rng.choice(JOURNALS),
+                              keywords=", ".join(rng.sample(KEYWORDS, 2)),
+                              volume=rng.randint(1, 100),
+                              year=1950 + i % 70))
+
+        f.write("@comment{BibDesk Static Groups{\n"
+                "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+                "<!DOCTYPE plist PUBLIC \"-//Apple//DTD PLIST 1.0//EN\" "
+                "\"http://www.apple.com/DTDs/PropertyList-1.0.dtd\">\n"
+                "<plist version=\"1.0\">\n"
+                "<array>\n")
+
+        for n in range(num_groups):
+            f.write("\t<dict>\n"
+                    "\t\t<key>group name</key>\n"
+                    "\t\t<string>Group {}</string>\n"
+                    "\t\t<key>keys</key>\n"
+                    "\t\t<string>{}</string>\n"
+                    "\t</dict>\n"
+                    "".format(n, ",".join(rng.sample(keys, min(group_size,
+                                                              len(keys))))))
+
+        f.write("</array>\n"
+                "</plist>\n"
+                "}}\n")
@@ -1,5 +1,15 @@
 """citationweb is a collection of tools to parse a bibtex file and generate
 a network of citations from it
+
+Importing the package is cheap: the Bibliography class and, with it, pybtex
+are only imported when the class is first accessed.
 """
 
-from .bibliography import Bibliography
+def __getattr__(name: str):
+    """Imports the Bibliography class on first access"""
+    if name == 'Bibliography':
+        from .bibliography import Bibliography
+        return Bibliography
+
+    raise AttributeError("module '{}' has no attribute "
+                         "'{}'".format(__name__, name))
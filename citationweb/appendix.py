@@ -0,0 +1,137 @@
+"""This module holds the Appendix class, a structured view of the @comment
+blocks of a bibtex file, in which programs like BibDesk or JabRef store
+their metadata, e.g. groups.
+
+Each block is recorded with its byte range in the file and its kind, which
+is determined from the start of its content. Single blocks can thus be read
+without reading or scanning the rest of the file.
+"""
+
+import re
+from collections import OrderedDict, namedtuple
+
+from citationweb import parsing
+from citationweb.parsing import open_buffer
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# The header of a comment block, up to the start of its content
+_COMMENT_HEADER = re.compile(rb'@\s*comment\s*[{(]\s*', re.IGNORECASE)
+
+# A comment block: its kind and the byte range [start, end) in the file
+CommentBlock = namedtuple('CommentBlock', ['kind', 'start', 'end'])
+
+# -----------------------------------------------------------------------------
+
+def comment_kind(raw: bytes, encoding: str=None) -> str:
+    """Determines the kind of a comment block from the start of its content,
+    using the kinds given in the configuration.
+
+    Args:
+        raw (bytes): The raw comment block, e.g. b'@comment{jabref-meta: ...}'
+        encoding (str, optional): The encoding of the block; defaults to the
+            encoding given in the configuration of the parsing module.
+
+    Returns:
+        str: The kind of the block, e.g. 'static_groups', or 'comment' if it
+            is of no known kind
+    """
+    encoding = encoding if encoding else parsing.cfg['encoding']
+
+    match = _COMMENT_HEADER.match(raw)
+    content = raw[match.end():] if match else raw
+
+    for kind, prefix in cfg['kinds'].items():
+        if content.startswith(prefix.encode(encoding)):
+            return kind
+
+    return 'comment'
+
+# -----------------------------------------------------------------------------
+
+class Appendix:
+    """An Appendix holds the comment blocks of a bibtex file, in the order of
+    the file, and reads their content on demand.
+    """
+
+    def __init__(self, file: str, blocks, encoding: str=None):
+        """Sets up the Appendix.
+
+        Args:
+            file (str): The bibtex file the blocks are in
+            blocks (Iterable[CommentBlock]): The comment blocks of the file
+            encoding (str, optional): The encoding of the file; defaults to
+                the encoding given in the configuration of the parsing module.
+        """
+        self._file = file
+        self._blocks = tuple(blocks)
+        self._encoding = encoding
+
+    # Properties ..............................................................
+
+    @property
+    def file(self) -> str:
+        """Returns the path to the file the blocks are in"""
+        return self._file
+
+    @property
+    def kinds(self) -> tuple:
+        """Returns the distinct kinds of the blocks, in the order of the
+        file"""
+        return tuple(OrderedDict.fromkeys(block.kind
+                                          for block in self._blocks))
+
+    # Magic methods ...........................................................
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def __getitem__(self, idx: int) -> CommentBlock:
+        return self._blocks[idx]
+
+    # Public methods ..........................................................
+
+    def find(self, kind: str) -> CommentBlock:
+        """Returns the first block of the given kind or None, if there is no
+        such block"""
+        for block in self._blocks:
+            if block.kind == kind:
+                return block
+
+        return None
+
+    def find_all(self, kind: str) -> list:
+        """Returns all blocks of the given kind"""
+        return [block for block in self._blocks if block.kind == kind]
+
+    def read(self, block: CommentBlock, buf=None) -> str:
+        """Reads the content of the given block, i.e. only its byte range.
+
+        Args:
+            block (CommentBlock): The block to read
+            buf (optional): A buffer holding the content of the file, e.g. a
+                memory map. If not given, the file is read.
+
+        Returns:
+            str: The raw block, e.g. '@comment{BibDesk Static Groups{...}}'
+        """
+        if buf is None:
+            with open_buffer(self.file) as buf:
+                return self.read(block, buf=buf)
+
+        encoding = self._encoding or parsing.cfg['encoding']
+        return str(buf[block.start:block.end], encoding)
+
+    def get(self, kind: str) -> str:
+        """Reads the content of the first block of the given kind.
+
+        Returns:
+            str: The raw block or None, if there is no block of that kind
+        """
+        block = self.find(kind)
+        return self.read(block) if block is not None else None
@@ -2,11 +2,28 @@
 to the bibtex file that is to be analysed.
 """
 
+import copy
+import hashlib
 import os
+from collections import OrderedDict
+from itertools import chain
 
-from pybtex.database import BibliographyData, parse_file
+from pybtex.database import BibliographyData
+from pybtex.utils import OrderedCaseInsensitiveDict
 
+from citationweb import cache, compression, parsing
+from citationweb.appendix import Appendix
+from citationweb.files import resolve_files
+from citationweb.groups import SmartGroups, StaticGroups
+from citationweb.index import Changes, EntryIndex, file_state
+from citationweb.journal import ChangeJournal, track, track_fields
+from citationweb.parsing import (extract_appdx, iter_block_entries,
+                                 iter_blocks, iter_entries, iter_lines,
+                                 open_buffer, parse_blocks, parse_parallel,
+                                 read_ends)
+from citationweb.store import CompactData, StringTable, intern_entry
 from citationweb.tools import load_cfg
+from citationweb.writing import format_entry, splice_file, write_bibfile
 
 # Local constants
 cfg = load_cfg(__name__)
@@ -18,32 +35,86 @@ class Bibliography:
     interface to analyse the corresponding citation network.
     
     Attributes:
-        CREATORS (list): A list of supported creator programmes
+        CREATORS (dict): The profiles of the supported creator programmes,
+            by name
+        PARSERS (tuple): The names of the available parsers
     """
     # Class variables
     CREATORS = cfg['creators']
+    PARSERS = ('pybtex', 'fast')
 
-    def __init__(self, file: str, creator: str=None):
+    def __init__(self, file: str, creator: str=None, workers: int=None,
+                 use_cache: bool=None, lazy: bool=False,
+                 lazy_fields: bool=False, fields=None, where=None,
+                 parser: str='pybtex', compact: bool=False):
         """Load the content of the given bibtex file.
         
         Args:
             file (str): The bibtex file to load and process
             creator (str, optional): The creator of the bibtex file. This will
-                have an impact on how the file is read and written.
+                have an impact on how the file is read and written. If
+                'auto', it is detected from the start and end of the file.
+            workers (int, optional): The number of processes to parse the
+                file with. If None or 1, the file is parsed in this process;
+                if 0, as many processes as there are CPUs are used.
+            use_cache (bool, optional): Whether to use the persistent cache
+                of parsed data. If None, uses the value in the configuration.
+            lazy (bool, optional): If set, the file is not loaded here.
+                Instead, the bibliography data and the appendix are loaded
+                independently of each other on first access.
+            lazy_fields (bool, optional): If set, the entries are LazyEntry
+                objects, which parse person fields and decode LaTeX only
+                when these are accessed.
+            fields (Iterable[str], optional): If given, only these fields
+                (including person fields) are kept while parsing.
+            where (Callable, optional): If given, only entries for which this
+                predicate returns True are kept while parsing. It is called
+                with the entry before its persons are added, and thus should
+                only depend on type, key and fields. When parsing with
+                multiple workers, it needs to be picklable. Data loaded with
+                a predicate is not cached.
+            parser (str, optional): The parser to use. With 'fast', entries
+                written with one field per line are parsed by a fast
+                tokenizer, if the creator supports it; all others by pybtex.
+            compact (bool, optional): If set, the data is a read-only
+                CompactData object, which stores the entries in shared arrays
+                and string tables instead of separate Entry objects. The file
+                is then always parsed entry by entry in this process.
         """
 
         # Initialise property-managed attributes
         self._file = None
         self._creator = None
+        self._parser = None
         self._data = None
         self._appdx = None
+        self._groups = None
+        self._smart_groups = None
+        self._index = None
+        self._snapshot = None
+        self._loaded_state = None
+        self._strings = None
+        self._ids = None
+        self._interned_seq = 0
+        self._journal = ChangeJournal()
 
         # Store properties
         self.file = file
         self.creator = creator
+        self.parser = parser
+
+        # Other attributes
+        self.workers = workers
+        self.use_cache = (use_cache if use_cache is not None
+                          else cache.cfg['enabled'])
+        self.lazy_fields = lazy_fields
+        self.fields = fields
+        self.where = where
+        self.compact = compact
 
         # Load the bibliography data
-        self._load()
+        if not lazy:
+            self._load()
 
 
     # Properties ..............................................................
@@ -55,7 +126,8 @@ class Bibliography:
 
     @file.setter
     def file(self, path: str):
-        """Stores the file property, performing a check if it exists."""
+        """Stores the file property, performing a check if it exists. The
+        file may be compressed, e.g. a .bib.gz or .bib.xz file."""
         if not os.path.isfile(path):
             raise FileNotFoundError("No such bibliography file: "+str(path))
 
@@ -63,14 +135,103 @@ class Bibliography:
     
     @property
     def data(self) -> BibliographyData:
-        """Returns the loaded BibliographyData"""
+        """Returns the loaded BibliographyData, loading it if necessary. In
+        compact mode, this is a CompactData object instead."""
+        if self._data is None:
+            self._load_data()
+
         return self._data
     
+    @property
+    def strings(self) -> StringTable:
+        """Returns the table of the interned strings, e.g. journals and
+        author names. The values are interned on first access, loading the
+        data if necessary; those of entries modified since are interned
+        again."""
+        self._intern_all()
+        return self._strings
+
     @property
     def appdx(self) -> str:
-        """Returns the appendix of the bibfile"""
+        """Returns the appendix of the bibfile, loading it if necessary"""
+        if self._appdx is None and 'load_appdx' in self.creator_params:
+            self._load_appdx(**self.creator_params['load_appdx'])
+
         return self._appdx
 
+    @property
+    def journal(self) -> ChangeJournal:
+        """Returns the journal of the modifications of the entries: setting
+        and deleting fields as well as adding, replacing and removing
+        entries. It also holds the entries that are dirty, i.e. were
+        modified since loading or saving.
+
+        Modifications that are not made via these operations, e.g. changing
+        the persons of an entry, are not detected; use mark_modified for
+        those. In compact mode, the data is read-only and nothing recorded.
+        """
+        return self._journal
+
+    @property
+    def appendix(self) -> Appendix:
+        """Returns the structured appendix of the bibfile, which holds all of
+        its comment blocks with their kinds and byte ranges. Unlike appdx,
+        it does not depend on the creator, and single blocks can be read
+        without reading the rest of the file."""
+        return Appendix(self.file, self.index.comments)
+
+    @property
+    def groups(self) -> StaticGroups:
+        """Returns the static groups stored in the appendix of the bibfile,
+        which map group names to citation keys and vice versa.
+
+        The groups are parsed on first access and again only if the appendix
+        changed since. If the creator does not store static groups, there
+        are no groups.
+        """
+        appdx = self.appdx
+
+        if self._groups is None or self._groups[0] != appdx:
+            if 'static_groups' in self.creator_params:
+                groups = StaticGroups.from_appdx(
+                    appdx, **self.creator_params['static_groups'])
+
+            else:
+                groups = StaticGroups()
+
+            self._groups = (appdx, groups)
+
+        return self._groups[1]
+
+    @property
+    def smart_groups(self) -> SmartGroups:
+        """Returns the smart groups stored in the appendix of the bibfile.
+
+        Like the static groups, these are parsed on first access and again
+        only if the appendix changed since. To determine the entries in all
+        smart groups at once, use their evaluate method on the entries.
+        """
+        appdx = self.appdx
+
+        if self._smart_groups is None or self._smart_groups[0] != appdx:
+            if 'smart_groups' in self.creator_params:
+                groups = SmartGroups.from_appdx(
+                    appdx, **self.creator_params['smart_groups'])
+
+            else:
+                groups = SmartGroups()
+
+            self._smart_groups = (appdx, groups)
+
+        return self._smart_groups[1]
+
+    @property
+    def index(self) -> EntryIndex:
+        """Returns the index of the entries in the bibfile, building it on
+        first access and updating it if the file changed since"""
+        self._update_index()
+        return self._index
+
     @property
     def creator(self) -> str:
         """Returns the name of the creator for the bibfile"""
@@ -78,7 +239,12 @@ class Bibliography:
 
     @creator.setter
     def creator(self, creator: str):
-        """Sets the creator of this Bibliography file"""
+        """Sets the creator of this Bibliography file; if 'auto', detects it
+        from the file, which is assumed to have no creator if no creator is
+        detected."""
+        if creator == 'auto':
+            creator = self._detect_creator()
+
         if creator and creator not in self.CREATORS.keys():
             creators = [k for k in self.CREATORS.keys()]
             raise ValueError("Unsupported creator '{}'! Supported creators "
@@ -86,6 +252,20 @@ class Bibliography:
 
         self._creator = creator
 
+    @property
+    def parser(self) -> str:
+        """Returns the name of the parser to use"""
+        return self._parser
+
+    @parser.setter
+    def parser(self, parser: str):
+        """Sets the parser to use"""
+        if parser not in self.PARSERS:
+            raise ValueError("Unsupported parser '{}'! Supported parsers are: "
+                             "{}".format(parser, ", ".join(self.PARSERS)))
+
+        self._parser = parser
+
     @property
     def creator_params(self) -> dict:
         """Returns the parameters for the set creator or an empty dict"""
@@ -95,11 +275,230 @@ class Bibliography:
 
     # Public methods ..........................................................
 
-    def save(self, path: str=None):
-        """Saves the current state of the bibtex data to
+    def iter_entries(self, **parser_kwargs):
+        """Iterates over the entries of the associated file, parsing them one
+        at a time.
+
+        Unlike the data property, this does not require the whole file to be
+        loaded: only a single entry is held in memory at any time.
+
+        Args:
+            **parser_kwargs: Passed on to the EntryParser, updating the
+                arguments given by the load options of this Bibliography
+
+        Yields:
+            Tuple[str, Entry]: The citation key and the corresponding entry
+        """
+        with compression.open_stream(self.file) as bibfile:
+            yield from iter_entries(bibfile,
+                                    **self._parser_kwargs(**parser_kwargs))
+
+    def save(self, path: str=None, force: bool=False):
+        """Saves the current state of the bibtex data to a file.
+
+        Only the entries that were modified, added or removed since loading
+        are written anew. Everything else, i.e. unmodified entries, comments,
+        macros and the appendix, is copied verbatim from the associated file,
+        using the byte ranges of the entry index. The modified entries are
+        the dirty entries of the journal; thus, the work done depends on the
+        number of modifications rather than the size of the library. When
+        saving over the associated file, the entry index of the saved file
+        is derived from the edits as well, instead of scanning the file.
+
+        If the associated file changed since loading, it cannot be copied
+        from. Overwriting it would discard the changes made to it, such that
+        this requires either reloading first or passing force. The data can
+        still be saved to another file, though. In both cases, all entries
+        are written one at a time, followed by the appendix; as the parsed
+        values hold the expansion of @string macros, these are not written
+        then.
+
+        In both cases, the data is written to a temporary file, which then
+        atomically replaces the target.
+
         Args:
-            path (str, optional): Description
+            path (str, optional): The file to save to. If not given, the
+                associated file is overwritten.
+            force (bool, optional): Whether to overwrite the associated file
+                even if it changed since loading
+
+        Raises:
+            ValueError: If the data was loaded with only some of the fields
+                or entries, which would be lost
+            RuntimeError: If the associated file is to be overwritten but
+                changed since loading, and force is not given
         """
+        if self.fields is not None or self.where is not None:
+            raise ValueError("Cannot save data that was loaded with the "
+                             "fields or where option, as the fields or "
+                             "entries that were not loaded would be lost!")
+
+        path = path if path is not None else self.file
+        data = self.data
+        sort_fields = self.creator_params.get('sort_fields', False)
+        indent = self.creator_params.get('indent')
+
+        snapshot = self._loaded_index()
+        own_file = os.path.realpath(path) == os.path.realpath(self.file)
+        index = None
+
+        if snapshot is not None and snapshot.is_valid:
+            edits = self._edits_since_load(sort_fields=sort_fields,
+                                           indent=indent)
+            splice_file(path, self.file, edits)
+
+            if own_file:
+                # Derive the index of the saved file from the applied edits
+                index = snapshot.splice(edits)
+
+        elif own_file and not force:
+            raise RuntimeError("The file {} changed since it was loaded! "
+                               "Reload it first or pass force=True to "
+                               "overwrite the changes.".format(self.file))
+
+        else:
+            write_bibfile(path, data.entries,
+                          preamble=getattr(data, 'preamble', None),
+                          appdx=self.appdx, sort_fields=sort_fields,
+                          indent=indent)
+
+        if own_file:
+            # The file now corresponds to the data. Its index is needed by
+            # reload once the file changed; if it cannot be derived from the
+            # edits, the file is indexed right away.
+            self._journal.clean()
+
+            if index is not None:
+                self._index = index
+                self._loaded_state = index.state
+                self._snapshot = copy.copy(index)
+
+            else:
+                self._loaded_state = file_state(self.file)
+                self._snapshot = None
+                self._update_index()
+
+    def mark_modified(self, key: str):
+        """Marks an entry as modified, for modifications that the journal
+        cannot detect by itself, e.g. changing the persons of the entry.
+
+        Args:
+            key (str): The citation key of the entry
+        """
+        self._journal.record('mark', key)
+
+    def reload(self) -> Changes:
+        """Reloads the associated file, re-parsing only those entries that
+        were added or changed since the last load.
+
+        Entries are compared via the fingerprints of their raw bytes, as
+        stored in the entry index, which is recorded while loading. If any
+        @string or @preamble block changed, all entries are re-parsed, as
+        they might depend on these blocks, and compared to the previous ones.
+
+        Entries that the file changed replace the loaded ones, even if these
+        were modified. Modified entries that the file did not change are
+        kept, and remain dirty.
+
+        Returns:
+            Changes: The keys of the entries that were added, changed or
+                removed in the file since the last load; these may include
+                entries that were dropped by the where predicate
+        """
+        # The appendix is reloaded on next access
+        self._appdx = None
+
+        if self._data is None:
+            # Nothing loaded yet, thus nothing that could have changed
+            return Changes(added=[], changed=[], removed=[])
+
+        snapshot = self._loaded_index()
+
+        with open_buffer(self.file) as buf:
+            self._update_index(buf=buf)
+            index = self._index
+
+            if (self.compact or snapshot is None
+                or snapshot.globals_fingerprint != index.globals_fingerprint):
+                return self._reload_all(buf, snapshot)
+
+            changes = self._reload_changed(index.diff(snapshot))
+
+            # Update the cache, unless the data holds unsaved modifications
+            # and thus does not correspond to the file
+            variant = self._cache_variant(compact=self.compact,
+                                          **self._parser_kwargs())
+            if (self.use_cache and variant and any(changes)
+                and not self._journal.dirty):
+                cache.store(self.file, (self._data, index.dump()),
+                            variant=variant, buf=buf)
+
+        return changes
+
+    def get_entry(self, key: str, **parser_kwargs):
+        """Parses a single entry from the associated file.
+
+        Uses the entry index to read and parse only the part of the file the
+        entry is stored in.
+
+        Args:
+            key (str): The citation key of the entry
+            **parser_kwargs: Passed on to the EntryParser, updating the
+                arguments given by the load options of this Bibliography
+
+        Returns:
+            Entry: The entry with the given key
+
+        Raises:
+            KeyError: If there is no entry with the given key
+        """
+        return self.index.parse(key, **self._parser_kwargs(**parser_kwargs))
+
+    def get_ids(self, key: str, field: str) -> tuple:
+        """Returns the ids of the interned values of a field or the names of
+        a person role of an entry; these ids refer to the strings table.
+
+        Which fields and roles are interned, is set in the configuration.
+        Fields holding a list of values, e.g. keywords, have one id per
+        value. The values are interned on first access; those of entries
+        modified since are interned again.
+
+        Args:
+            key (str): The citation key of the entry
+            field (str): The name of the field or person role
+
+        Returns:
+            tuple: The ids of the values; empty if the entry has no such
+                field or it is not interned
+
+        Raises:
+            KeyError: If there is no entry with the given key
+        """
+        self._intern_all()
+        return self._ids[key.lower()].get(field.lower(), ())
+
+    def resolve_files(self) -> OrderedDict:
+        """Resolves the files linked to the entries, e.g. PDFs, in bulk.
+
+        Which fields hold linked files is set by the creator; without one,
+        there are no linked files. Relative paths refer to the directory of
+        the bibfile.
+
+        Returns:
+            OrderedDict: Tuples of LinkedFile objects, holding the field, the
+                absolute path and whether the file exists, by citation key
+        """
+        if 'linked_files' not in self.creator_params:
+            return OrderedDict()
+
+        return resolve_files(self.data.entries,
+                             base_dir=os.path.dirname(
+                                 os.path.abspath(self.file)),
+                             **self.creator_params['linked_files'])
+
+    def invalidate_cache(self):
+        """Removes the cached data of the associated file"""
+        cache.invalidate(self.file)
 
     # Private methods .........................................................
 
@@ -107,16 +506,422 @@ class Bibliography:
         """Load the file associated with this instance.
 
         This loads not only bibliography data but also any form of appendix to
-        the file, as common with e.g. BibDesk.
+        the file, as common with e.g. BibDesk. The file is read only once:
+        both are extracted from the same memory map of the file.
         """
-        # Load the bibliography data
-        self._data = parse_file(self.file, **load_kwargs)
+        with open_buffer(self.file) as buf:
+            # Load the bibliography data
+            self._load_data(buf=buf, **load_kwargs)
 
-        # Load the appendix
-        if 'load_appdx' in self.creator_params:
-            self._load_appdx(**self.creator_params['load_appdx'])
+            # Load the appendix
+            if 'load_appdx' in self.creator_params:
+                self._load_appdx(buf=buf,
+                                 **self.creator_params['load_appdx'])
+
+    def _load_data(self, buf=None, **load_kwargs):
+        """Load the bibliography data of the file associated with this
+        instance, from the cache if possible.
+
+        Args:
+            buf (optional): A buffer holding the content of the file, e.g. a
+                memory map. If not given, the file is read.
+            **load_kwargs: Passed on to the EntryParser, updating the
+                arguments given by the load options of this Bibliography
+        """
+        if buf is None:
+            with open_buffer(self.file) as buf:
+                return self._load_data(buf=buf, **load_kwargs)
+
+        state = file_state(self.file)
+        data, index = self._read_data(buf, **load_kwargs)
 
-    def _load_appdx(self, start_str: str) -> str:
+        self._set_data(data, index, state)
+        self._journal.clean()
+
+    def _read_data(self, buf, **load_kwargs) -> tuple:
+        """Reads the bibliography data of the associated file from the given
+        buffer, from the cache if possible, along with the entry index of the
+        file. If the data is parsed, the index is recorded from the same
+        blocks the parser reads; otherwise, it is restored from the cache.
+
+        Args:
+            buf: A buffer holding the content of the file, e.g. a memory map
+            **load_kwargs: Passed on to the EntryParser, updating the
+                arguments given by the load options of this Bibliography
+
+        Returns:
+            tuple: The data and the EntryIndex of the file
+        """
+        parser_kwargs = self._parser_kwargs(**load_kwargs)
+        variant = self._cache_variant(compact=self.compact, **parser_kwargs)
+        index = EntryIndex(self.file, build=False)
+
+        # Load the bibliography data, from the cache if possible
+        if self.use_cache and variant:
+            cached = cache.load(self.file, variant=variant, buf=buf)
+
+            if cached is not None:
+                data, content = cached
+                index.restore(content)
+                return data, index
+
+        # Need to parse it, in parallel if configured to do so
+        blocks = index.record(iter_blocks(iter_lines(buf)))
+
+        if self.compact:
+            # Convert entry by entry, without keeping the parsed entries
+            parser_kwargs['lazy_fields'] = True
+            data = CompactData.from_entries(
+                iter_block_entries(blocks, **parser_kwargs))
+
+        elif self.workers is None or self.workers == 1:
+            data = parse_blocks(blocks, filename=self.file, **parser_kwargs)
+
+        else:
+            data = parse_parallel(buf, workers=self.workers, blocks=blocks,
+                                  **parser_kwargs)
+
+        if self.use_cache and variant:
+            cache.store(self.file, (data, index.dump()), variant=variant,
+                        buf=buf)
+
+        return data, index
+
+    def _set_data(self, data, index: EntryIndex, state: tuple):
+        """Sets the loaded bibliography data, along with the index of the
+        file in the given state the data was loaded from. Reloading and
+        saving use this index to determine the entries that changed; if it
+        does not describe that state, it is built when needed."""
+        self._data = data
+
+        # The values are interned on first use or, if their strings are to
+        # be shared by the entries, now
+        self._strings = None
+        self._ids = None
+        if cfg['interning']['share_values'] and not self.compact:
+            self._intern_all()
+
+        # Record modifications of the entries from now on
+        self._track_entries()
+
+        self._index = index
+        self._loaded_state = state
+        self._snapshot = None
+        self._keep_snapshot()
+
+    def _reload_changed(self, changes: Changes) -> Changes:
+        """Re-parses only the entries that were added or changed in the
+        associated file and drops the removed ones. As these entries then
+        correspond to the file, they are neither recorded nor dirty.
+
+        Args:
+            changes (Changes): The changes of the file since the last load
+
+        Returns:
+            Changes: The given changes
+        """
+        index = self._index
+        parsed = changes.added + changes.changed
+        entries = self._data.entries
+
+        with self._journal.paused():
+            for key in changes.removed:
+                entries.pop(key, None)
+                self._forget_ids(key)
+
+            for key in parsed:
+                try:
+                    entries[key] = index.parse(key, **self._parser_kwargs())
+
+                except KeyError:
+                    # Dropped by the predicate
+                    entries.pop(key, None)
+                    self._forget_ids(key)
+
+        if changes.added:
+            # Restore the order of the file
+            self._data.entries = track(
+                OrderedCaseInsensitiveDict((key, entries[key])
+                                           for key in index
+                                           if key in entries),
+                self._journal)
+
+        self._intern_entries(parsed)
+        self._track_entries(parsed)
+        self._journal.clean(parsed + changes.removed)
+        self._snapshot = copy.copy(index)
+        self._loaded_state = index.state
+
+        return changes
+
+    def _reload_all(self, buf, snapshot: EntryIndex) -> Changes:
+        """Reloads all entries of the associated file from the given buffer.
+
+        Unmodified entries are compared to the re-parsed ones. Whether the
+        file changed the dirty entries, is determined via the fingerprints in
+        the given index of the loaded state of the file; if these are not
+        available, all dirty entries are kept.
+
+        Returns:
+            Changes: The keys of the entries that were added, changed or
+                removed in the file since the last load
+        """
+        old_entries = self._data.entries
+        file_changes = (self._index.diff(snapshot)
+                        if snapshot is not None else None)
+
+        # The entries that the file changed, by how it changed them
+        touched = dict()
+        if file_changes is not None:
+            for kind, keys in zip(Changes._fields, file_changes):
+                touched.update((key.lower(), kind) for key in keys)
+
+        dirty = OrderedDict((key.lower(), key) for key in self._journal.dirty)
+        kept = [key for lkey, key in dirty.items() if lkey not in touched]
+
+        state = file_state(self.file)
+        data, index = self._read_data(buf)
+        new_entries = data.entries
+
+        changes = Changes(added=[], changed=[], removed=[])
+        for key in chain(new_entries,
+                         (k for k in old_entries if k not in new_entries)):
+            if key.lower() in dirty:
+                if key.lower() in touched:
+                    getattr(changes, touched[key.lower()]).append(key)
+
+            elif key not in old_entries:
+                changes.added.append(key)
+
+            elif key not in new_entries:
+                changes.removed.append(key)
+
+            elif new_entries[key] != old_entries[key]:
+                changes.changed.append(key)
+
+        # Keep the modifications the file did not overwrite
+        for key in kept:
+            if key in old_entries:
+                new_entries[key] = old_entries[key]
+
+            else:
+                new_entries.pop(key, None)
+
+        self._set_data(data, index, state)
+        self._journal.clean([key for key in dirty.values()
+                             if key not in kept])
+
+        return changes
+
+    def _intern_all(self):
+        """Interns the values of all entries, unless that already happened,
+        loading the data if necessary. If it did, only the values of the
+        entries modified since are interned again."""
+        if self._data is None:
+            self._load_data()
+
+        if self._ids is not None:
+            self._intern_modified()
+            return
+
+        self._strings = (self._data.strings if self.compact
+                         else StringTable())
+        self._ids = dict()
+        self._intern_entries()
+        self._interned_seq = self._journal.seq
+
+    def _intern_modified(self):
+        """Interns the values of the entries that were added or modified
+        since the values were last interned and drops the ids of removed
+        entries. Strings no longer in use are kept in the table."""
+        keys = self._journal.dirty_since(self._interned_seq)
+        self._interned_seq = self._journal.seq
+
+        for key in keys:
+            if key not in self._data.entries:
+                self._forget_ids(key)
+
+        self._intern_entries(keys)
+
+        # Sharing the values replaced the tracked fields
+        self._track_entries(keys)
+
+    def _intern_entries(self, keys=None):
+        """Interns the configured field values of the given entries or of all
+        entries, storing the ids of the values. Nothing happens if no values
+        were interned yet, as all entries are interned on first use.
+
+        If configured to share values, the fields of the entries are replaced
+        by ones holding the interned strings, unless in compact mode, where
+        strings are shared anyway.
+        """
+        if self._ids is None:
+            return
+
+        entries = self._data.entries
+        params = cfg['interning']
+
+        for key in (keys if keys is not None else entries):
+            if key not in entries:
+                # Dropped by the predicate
+                continue
+
+            self._ids[key.lower()] = intern_entry(
+                self._strings, entries[key], fields=params['fields'],
+                persons=params['persons'], separators=params['separators'],
+                replace=params['share_values'] and not self.compact)
+
+    def _forget_ids(self, key: str):
+        """Removes the ids of the interned values of the given entry"""
+        if self._ids is not None:
+            self._ids.pop(key.lower(), None)
+
+    def _track_entries(self, keys=None):
+        """Makes the given entries or, if no keys are given, all entries and
+        the entries mapping report their modifications to the journal. In
+        compact mode, the data is read-only and nothing is tracked."""
+        if self.compact:
+            return
+
+        if keys is None:
+            self._data.entries = track(self._data.entries, self._journal)
+            return
+
+        entries = self._data.entries
+        for key in keys:
+            if key in entries:
+                track_fields(entries[key], key, self._journal)
+
+    def _edits_since_load(self, sort_fields: bool=False,
+                          indent: str=None) -> list:
+        """Determines the edits of the associated file that correspond to
+        the modifications of the data since it was loaded, i.e. to the dirty
+        entries of the journal.
+
+        Added entries are inserted after the last entry of the file.
+
+        Returns:
+            list: The edits as (start, end, text) tuples, sorted by start,
+                as expected by splice_file
+        """
+        entries = self._data.entries
+        snapshot = self._loaded_index()
+        edits = []
+        added = []
+
+        for key in self._journal.dirty:
+            # Without the trailing newline, which is part of the file
+            text = (format_entry(key, entries[key], sort_fields=sort_fields,
+                                 indent=indent)[:-1]
+                    if key in entries else '')
+
+            if key in snapshot:
+                start, length = snapshot[key]
+                edits.append((start, start + length, text))
+
+            elif text:
+                added.append(text)
+
+        edits.sort(key=lambda edit: edit[0])
+
+        if added:
+            end = snapshot.entries_end
+            edits.append((end, end, ("\n\n" if end else "")
+                          + "\n\n".join(added)))
+
+        return edits
+
+    def _loaded_index(self) -> EntryIndex:
+        """Returns the index of the file in the state it was in when the data
+        was loaded or saved. If it was not built yet, it is built now.
+
+        Returns:
+            EntryIndex: The index, or None if the file changed before it was
+                built, such that its previous state cannot be indexed anymore
+        """
+        if self._snapshot is None and self._loaded_state is not None:
+            self._update_index()
+
+        return self._snapshot
+
+    def _detect_creator(self) -> str:
+        """Detects the creator of the associated file by the strings that
+        mark the files of each creator, as given in its profile. Only the
+        start and the end of the file are read.
+
+        Returns:
+            str: The name of the first creator with a marking string in the
+                start or end of the file, or None if there is none
+        """
+        head, tail = read_ends(self.file, cfg['detect_creator']['size'])
+        encoding = parsing.cfg['encoding']
+
+        for name, params in self.CREATORS.items():
+            markers = params.get('detect', dict())
+
+            if (any(marker.encode(encoding) in head
+                    for marker in markers.get('head', ()))
+                or any(marker.encode(encoding) in tail
+                       for marker in markers.get('tail', ()))):
+                return name
+
+        return None
+
+    def _parser_kwargs(self, **parser_kwargs) -> dict:
+        """Returns the arguments to the EntryParser that correspond to the
+        load options of this Bibliography, updated by the given ones"""
+        fast = (self.parser == 'fast'
+                and self.creator_params.get('fast_parser', False))
+
+        kwargs = dict(lazy_fields=self.lazy_fields, fields=self.fields,
+                      where=self.where, fast=fast)
+        kwargs.update(parser_kwargs)
+        return kwargs
+
+    @staticmethod
+    def _cache_variant(compact: bool=False, lazy_fields: bool=False,
+                       fields=None, where=None, fast: bool=False,
+                       **parser_kwargs) -> str:
+        """Returns the name of the cache variant for data parsed with the
+        given arguments, or None if such data cannot be cached. As the fast
+        tokenizer yields the same data, it shares the variant."""
+        if where is not None or parser_kwargs:
+            # Cannot tell whether cached data was parsed the same way
+            return None
+
+        variant = []
+        if compact:
+            variant.append('compact')
+
+        elif lazy_fields:
+            variant.append('lazy_fields')
+
+        if fields is not None:
+            fields = ",".join(sorted(set(f.lower() for f in fields)))
+            variant.append('fields-'
+                           + hashlib.sha1(fields.encode('utf-8')).hexdigest())
+
+        return '+'.join(variant) if variant else 'default'
+
+    def _update_index(self, buf=None):
+        """Creates or updates the entry index, using the given buffer holding
+        the content of the file, if it needs to be rebuilt"""
+        if self._index is None:
+            self._index = EntryIndex(self.file, buf=buf)
+
+        else:
+            self._index.update(buf=buf)
+
+        self._keep_snapshot()
+
+    def _keep_snapshot(self):
+        """Keeps a copy of the index as the index of the loaded state of the
+        file, if it describes that state and there is no such copy yet"""
+        if (self._snapshot is None and self._index is not None
+            and self._index.state == self._loaded_state):
+            self._snapshot = copy.copy(self._index)
+
+    def _load_appdx(self, start_str: str, buf=None):
         """This method extracts a part at the end of the bibfile, starting
         with a start_str, for example the @comment{} section or sections of a
         bibtex file.
@@ -130,24 +935,11 @@ class Bibliography:
         
         Args:
             start_str (str): The string that indicates the start of the appdx
-        
-        Returns:
-            str: The appendix of the bibfile
+            buf (optional): A buffer holding the content of the file, e.g. a
+                memory map. If not given, the file is read.
         """
+        if buf is None:
+            with open_buffer(self.file) as buf:
+                return self._load_appdx(start_str, buf=buf)
 
-        appdx = ''
-        appdx_reached = False
-
-        with open(self.file) as bibfile:
-            for line in bibfile:
-                if not appdx_reached:
-                    # Check if this line starts with the desired string
-                    if line.startswith(start_str):
-                        # Yup. Reached the appendix now
-                        appdx_reached = True
-
-                # Store this line, if in appdx
-                if appdx_reached:
-                    appdx += line
-
-        self._appdx = appdx
+        self._appdx = extract_appdx(buf, start_str)
@@ -0,0 +1,234 @@
+"""This module implements a persistent on-disk cache of parsed bibliography
+data, such that unchanged files need not be parsed again.
+
+Cache files are identified by the absolute path of the bibliography file and
+a variant string, which distinguishes different ways of loading the same
+file; it needs to be usable as part of a file name. Each cache file holds a
+header describing the state of the bibliography file it was created from
+(size, modification time and content hash), followed by the pickled data.
+The content hash refers to the decompressed content of compressed files; it
+is computed from a buffer holding the content, if one is given, such that a
+file that is parsed anyway is not read a second time.
+
+The cache directory also holds the persisted entry indices, see the index
+module; these are removed and counted towards the maximum size of the cache
+like the cache files.
+"""
+
+import gc
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+
+from citationweb import compression
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+CACHE_DIR = os.path.expanduser(cfg['cache_dir'])
+CACHE_EXT = '.pickle'
+INDEX_EXT = '.cwidx'
+
+# -----------------------------------------------------------------------------
+
+def load(path: str, variant: str='default', buf=None):
+    """Loads the cached data for the given file, if the cache is valid.
+
+    Args:
+        path (str): The path to the bibliography file
+        variant (str, optional): The variant of the cached data
+        buf (optional): A buffer holding the content of the file, e.g. a
+            memory map, to compute the content hash from. If not given, the
+            file is read.
+
+    Returns:
+        The cached data or None, if there was no valid cache
+    """
+    cache_file = _cache_file(path, variant)
+
+    try:
+        with open(cache_file, 'rb') as f:
+            header = pickle.load(f)
+            if header != _file_state(path, header=header, buf=buf):
+                return None
+
+            data = _unpickle(f)
+
+    except Exception:
+        # Any failure in reading the cache amounts to a cache miss
+        return None
+
+    # Mark the cache file as recently used, if possible
+    try:
+        os.utime(cache_file)
+
+    except OSError:
+        pass
+
+    return data
+
+def store(path: str, data, variant: str='default', buf=None):
+    """Stores the data of the given file in the cache.
+
+    The cache file is written atomically. If the total size of the cache
+    exceeds the configured maximum, the least recently used cache files are
+    removed. Failing to write to the cache directory is not an error, as the
+    data can be parsed again anyway.
+
+    Args:
+        path (str): The path to the bibliography file
+        data: The data to cache; needs to be picklable
+        variant (str, optional): The variant of the cached data
+        buf (optional): A buffer holding the content of the file, e.g. a
+            memory map, to compute the content hash from. If not given, the
+            file is read.
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(_file_state(path, buf=buf), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, _cache_file(path, variant))
+
+    except OSError:
+        _remove(tmp_path)
+        return
+
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+    prune()
+
+def invalidate(path: str):
+    """Removes the cached data of the given file, of all variants, and its
+    persisted entry index.
+
+    Args:
+        path (str): The path to the bibliography file
+    """
+    for cache_file in glob.glob(_cache_file(path, '*')) + [index_file(path)]:
+        _remove(cache_file)
+
+def clear():
+    """Removes all cache files and persisted entry indices"""
+    for cache_file in _all_files():
+        _remove(cache_file)
+
+def prune(max_size: int=None):
+    """Removes the least recently used cache files and persisted entry
+    indices until the total size of the cache is below the maximum size.
+
+    Other processes may prune the cache at the same time; files that vanish
+    meanwhile are skipped.
+
+    Args:
+        max_size (int, optional): The maximum size in bytes; defaults to the
+            value given in the configuration.
+    """
+    max_size = max_size if max_size is not None else cfg['max_size']
+
+    cache_files = []
+    for cache_file in _all_files():
+        try:
+            stat = os.stat(cache_file)
+
+        except OSError:
+            continue
+
+        cache_files.append((stat.st_mtime, stat.st_size, cache_file))
+
+    total = sum(size for _, size, _ in cache_files)
+
+    for _, size, cache_file in sorted(cache_files):
+        if total <= max_size:
+            break
+
+        _remove(cache_file)
+        total -= size
+
+def index_file(path: str) -> str:
+    """Returns the path to the file the entry index of the given file is
+    persisted to, see index.EntryIndex"""
+    return os.path.join(CACHE_DIR, _name(path) + INDEX_EXT)
+
+# -----------------------------------------------------------------------------
+
+def _name(path: str) -> str:
+    """Returns the name that the files in the cache directory that belong
+    to the given file start with"""
+    return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+def _cache_file(path: str, variant: str) -> str:
+    """Returns the path to the cache file for the given file and variant"""
+    return os.path.join(CACHE_DIR, _name(path) + '.' + variant + CACHE_EXT)
+
+def _all_files() -> list:
+    """Returns the paths to all cache files and persisted entry indices"""
+    return [path for ext in (CACHE_EXT, INDEX_EXT)
+            for path in glob.glob(os.path.join(CACHE_DIR, '*' + ext))]
+
+def _file_state(path: str, header: dict=None, buf=None) -> dict:
+    """Returns a description of the current state of the given file.
+
+    If a header is given and size or modification time do not match it, the
+    content hash is not computed, as the state will not match anyway. If a
+    buffer holding the content of the file is given, the hash is computed
+    from it instead of reading the file.
+    """
+    stat = os.stat(path)
+    state = dict(path=os.path.abspath(path), size=stat.st_size,
+                 mtime=stat.st_mtime_ns, digest=None)
+
+    if header and (header['size'], header['mtime']) != (state['size'],
+                                                         state['mtime']):
+        return state
+
+    if cfg['verify_digest'] and buf is not None:
+        state['digest'] = hashlib.sha1(buf).hexdigest()
+
+    elif cfg['verify_digest']:
+        digest = hashlib.sha1()
+
+        with compression.open_stream(path) as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+
+        state['digest'] = digest.hexdigest()
+
+    return state
+
+def _unpickle(f):
+    """Unpickles from the given file with the garbage collector suspended.
+
+    Unpickling creates many container objects, which repeatedly triggers the
+    garbage collector without there being any garbage to collect.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        return pickle.load(f)
+
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _remove(path: str):
+    """Removes a file, if possible; failing to do so is not an error, e.g.
+    if another process removed it already"""
+    try:
+        os.remove(path)
+
+    except OSError:
+        pass
@@ -0,0 +1,116 @@
+"""This module handles compressed bibtex files, e.g. archived snapshots of a
+library as .bib.gz or .bib.xz files.
+
+Existing files are detected as compressed by their magic bytes, such that
+their name does not matter when reading them; files that are written are
+compressed according to their extension. The compressed data is read and
+written as a stream.
+"""
+
+import gzip
+import lzma
+import os
+
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# The magic bytes at the start of compressed files, by compression
+MAGIC = {'gzip': b'\x1f\x8b',
+         'xz': b'\xfd7zXZ\x00'}
+
+# -----------------------------------------------------------------------------
+
+def detect(path: str, mode: str='r') -> str:
+    """Determines the compression of a file.
+
+    For reading, the magic bytes of the file decide; for writing, its
+    extension does, as the file may not exist yet. In both cases, the
+    respective other is used if the first is inconclusive.
+
+    Args:
+        path (str): The path to the file
+        mode (str, optional): Whether the file is to be read ('r') or
+            written ('w')
+
+    Returns:
+        str: The compression, i.e. a key of MAGIC, or None if the file is
+            not compressed
+    """
+    by_magic = _detect_magic(path)
+    by_ext = cfg['extensions'].get(os.path.splitext(path)[1].lower())
+
+    if mode.startswith('w'):
+        return by_ext if by_ext else by_magic
+
+    return by_magic if by_magic else by_ext
+
+def open_stream(path: str, compression: str=None):
+    """Opens a file for reading as a binary stream, decompressing it.
+
+    Args:
+        path (str): The path to the file
+        compression (str, optional): The compression of the file; if not
+            given, it is detected.
+
+    Returns:
+        A binary file object, which yields the decompressed content
+    """
+    compression = compression if compression else detect(path)
+
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+
+    elif compression == 'xz':
+        return lzma.open(path, 'rb')
+
+    elif compression is None:
+        return open(path, 'rb')
+
+    raise ValueError("Unsupported compression '{}'! Supported are: "
+                     "{}".format(compression, ", ".join(MAGIC)))
+
+def compressing_writer(fileobj, compression: str):
+    """Wraps a binary file object that is open for writing, such that the
+    data written to the wrapper is compressed.
+
+    Closing the wrapper writes the end of the compressed stream, but does
+    not close the wrapped file object.
+
+    Args:
+        fileobj: The binary file object to write to
+        compression (str): The compression, a key of MAGIC
+
+    Returns:
+        The compressing binary file object
+    """
+    if compression == 'gzip':
+        # Without a file name, none is stored in the header; the wrapped
+        # object would give the name of a temporary file otherwise
+        return gzip.GzipFile(filename='', mode='wb', fileobj=fileobj,
+                             compresslevel=cfg['gzip_level'])
+
+    elif compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode='wb', preset=cfg['xz_preset'])
+
+    raise ValueError("Unsupported compression '{}'! Supported are: "
+                     "{}".format(compression, ", ".join(MAGIC)))
+
+# -----------------------------------------------------------------------------
+
+def _detect_magic(path: str) -> str:
+    """Returns the compression given by the magic bytes of a file, or None
+    if it has none or does not exist"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(max(len(magic) for magic in MAGIC.values()))
+
+    except OSError:
+        return None
+
+    for compression, magic in MAGIC.items():
+        if head.startswith(magic):
+            return compression
+
+    return None
@@ -0,0 +1,120 @@
+"""This module holds entry classes that extend the pybtex Entry, e.g. by
+deferring expensive processing of field values until they are accessed.
+"""
+
+import codecs
+
+from pybtex.bibtex.utils import split_name_list
+from pybtex.database import Entry, Person
+from pybtex.utils import OrderedCaseInsensitiveDict
+
+# -----------------------------------------------------------------------------
+
+def decode_latex(value: str) -> str:
+    """Decodes a LaTeX-encoded field value into plain unicode text.
+
+    Args:
+        value (str): The field value, e.g. `Schr\\"odinger's {Cat}`
+
+    Returns:
+        str: The plain text, e.g. `Schrödinger's Cat`
+    """
+    # Only needed for decoding; importing latexcodec registers its codecs
+    import latexcodec  # noqa: F401
+    from pybtex.richtext import Text
+
+    return Text.from_latex(codecs.decode(value, 'ulatex')).render_as('text')
+
+# -----------------------------------------------------------------------------
+
+class LazyEntry(Entry):
+    """A LazyEntry keeps the values of person fields as raw strings and
+    parses them into Person objects only when the persons attribute is first
+    accessed. Furthermore, it provides the LaTeX-decoded field values, which
+    are decoded on first access as well.
+
+    Apart from that, it behaves like a pybtex Entry.
+    """
+
+    def __init__(self, type_: str, fields=None, persons=None):
+        """Sets up a LazyEntry.
+
+        Args:
+            type_ (str): The entry type, e.g. 'article'
+            fields (optional): The fields of the entry
+            persons (optional): Persons of the entry, by their roles
+        """
+        self._persons = None
+        self._raw_persons = OrderedCaseInsensitiveDict()
+        self._decoded = dict()
+
+        super().__init__(type_, fields=fields, persons=persons)
+
+    # Properties ..............................................................
+
+    @property
+    def persons(self) -> OrderedCaseInsensitiveDict:
+        """Returns the persons of this entry by their roles, parsing the raw
+        person fields on first access"""
+        if self._raw_persons:
+            raw_persons = list(self._raw_persons.items())
+            self._raw_persons.clear()
+
+            for role, names in raw_persons:
+                for name in split_name_list(names):
+                    self._persons.setdefault(role, []).append(Person(name))
+
+        return self._persons
+
+    @persons.setter
+    def persons(self, persons: OrderedCaseInsensitiveDict):
+        """Sets the persons of this entry"""
+        self._persons = persons
+
+    # Public methods ..........................................................
+
+    def add_raw_persons(self, role: str, names: str):
+        """Adds the raw value of a person field, e.g. `Eigen, M. and Doe, J.`,
+        which is parsed only when the persons are accessed.
+        """
+        if role in self._raw_persons:
+            self._raw_persons[role] += " and " + names
+
+        else:
+            self._raw_persons[role] = names
+
+    def person_roles(self) -> list:
+        """Returns the roles of the persons of this entry, without parsing
+        raw person fields"""
+        roles = list(self._persons.keys())
+        return roles + [role for role in self._raw_persons
+                        if role not in self._persons]
+
+    def person_names(self, role: str) -> list:
+        """Returns the names of the persons with the given role as strings,
+        without parsing raw person fields.
+        """
+        names = [str(person) for person in self._persons.get(role, [])]
+
+        if role in self._raw_persons:
+            names += split_name_list(self._raw_persons[role])
+
+        return names
+
+    def decoded(self, field: str) -> str:
+        """Returns the LaTeX-decoded value of the given field.
+
+        The decoded value is memoised; it is decoded again only if the field
+        value changed since.
+
+        Raises:
+            KeyError: If there is no such field
+        """
+        value = self.fields[field]
+        cached = self._decoded.get(field.lower())
+
+        if cached is None or cached[0] != value:
+            cached = (value, decode_latex(value))
+            self._decoded[field.lower()] = cached
+
+        return cached[1]
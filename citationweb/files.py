@@ -0,0 +1,137 @@
+"""This module resolves the files that are linked to bibliography entries,
+e.g. via the Bdsk-File-N fields that BibDesk writes.
+
+BibDesk stores each linked file as a base64-encoded binary property list,
+which holds the path of the file relative to the bibfile, alongside alias
+or bookmark data that is only usable on macOS.
+"""
+
+import base64
+import os
+import plistlib
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# A file linked to an entry: the field it is linked in, its absolute path
+# (None, if it could not be decoded) and whether it exists
+LinkedFile = namedtuple('LinkedFile', ['field', 'path', 'exists'])
+
+# -----------------------------------------------------------------------------
+
+@lru_cache(maxsize=cfg['decode_cache_size'])
+def decode_bdsk_file(blob: str) -> str:
+    """Decodes the value of a Bdsk-File-N field into the relative path of
+    the linked file.
+
+    Both the plain property lists of older BibDesk versions and the keyed
+    archives of newer ones are supported. The decoded paths are cached by
+    the encoded value.
+
+    Args:
+        blob (str): The base64-encoded property list
+
+    Returns:
+        str: The path of the linked file, relative to the bibfile
+
+    Raises:
+        ValueError: If the value cannot be decoded or holds no path
+    """
+    try:
+        plist = plistlib.loads(base64.b64decode(blob))
+
+    except Exception as err:
+        raise ValueError("Could not decode linked file: {}".format(err)
+                         ) from err
+
+    if '$objects' in plist:
+        # A keyed archive; the relative path is referenced by the root object
+        objects = plist['$objects']
+
+        def deref(obj):
+            return objects[obj.data] if hasattr(obj, 'data') else obj
+
+        try:
+            root = deref(plist['$top']['root'])
+            path = deref(root['relativePath'])
+
+        except (KeyError, IndexError, TypeError) as err:
+            raise ValueError("Keyed archive of linked file holds no relative "
+                             "path!") from err
+
+    else:
+        path = plist.get('relativePath') if isinstance(plist, dict) else None
+
+    if not isinstance(path, str):
+        raise ValueError("Linked file holds no relative path!")
+
+    return path
+
+def resolve_files(entries, base_dir: str, field_prefix: str) -> OrderedDict:
+    """Resolves the files linked to the given entries.
+
+    The linked files of all entries are decoded first. Their existence is
+    then checked with a single directory listing per directory, instead of
+    one stat call per file.
+
+    Args:
+        entries: A mapping of citation keys to entries, e.g. the entries of
+            a BibliographyData
+        base_dir (str): The directory that relative paths refer to, i.e.
+            the directory of the bibfile
+        field_prefix (str): The prefix of the names of the fields holding
+            linked files, which are numbered, e.g. 'Bdsk-File-'
+
+    Returns:
+        OrderedDict: Tuples of LinkedFile objects by citation key, ordered by
+            their number; entries without linked files are not included.
+    """
+    prefix = field_prefix.lower()
+    linked = OrderedDict()
+
+    # Decode all linked files
+    for key, entry in entries.items():
+        files = []
+
+        for field, value in entry.fields.items():
+            number = field[len(prefix):]
+            if not (field.lower().startswith(prefix) and number.isdigit()):
+                continue
+
+            try:
+                path = os.path.normpath(os.path.join(base_dir,
+                                                     decode_bdsk_file(value)))
+
+            except ValueError:
+                path = None
+
+            files.append((int(number), field, path))
+
+        if files:
+            linked[key] = sorted(files)
+
+    # Check existence with one listing per directory
+    listings = dict()
+    for files in linked.values():
+        for _, _, path in files:
+            if path is not None:
+                listings.setdefault(os.path.dirname(path), None)
+
+    for dirname in listings:
+        try:
+            listings[dirname] = frozenset(os.listdir(dirname))
+
+        except OSError:
+            listings[dirname] = frozenset()
+
+    return OrderedDict(
+        (key, tuple(LinkedFile(field=field, path=path,
+                               exists=(path is not None
+                                       and os.path.basename(path)
+                                       in listings[os.path.dirname(path)]))
+                    for _, field, path in files))
+        for key, files in linked.items())
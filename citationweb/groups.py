@@ -0,0 +1,308 @@
+"""This module holds classes for the groups that BibDesk stores as XML
+property lists in the appendix of a bibfile: the StaticGroups, which list
+the citation keys of their entries, and the SmartGroups, whose entries are
+determined by conditions on the entry fields.
+"""
+
+import plistlib
+import warnings
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from itertools import compress
+
+# The condition of a smart group and the definition of a smart group
+Condition = namedtuple('Condition', ['field', 'comparison', 'value'])
+SmartGroup = namedtuple('SmartGroup', ['name', 'conjunction', 'conditions'])
+
+# The conjunctions of the conditions of a smart group, by their BibDesk code
+CONJUNCTIONS = {0: all, 1: any}
+
+# The (lower-case) fields whose conditions BibDesk evaluates as dates, with
+# comparisons relative to the current date, e.g. 'in the last N days'. These
+# are not supported; their codes differ from those in COMPARISONS.
+DATE_FIELDS = ('date-added', 'date-modified')
+
+# -----------------------------------------------------------------------------
+
+class StaticGroups(Mapping):
+    """A read-only mapping of group names to the citation keys of the entries
+    in the group; it also provides the groups of each entry.
+
+    Citation keys are case-insensitive when looking up the groups of an
+    entry, as in pybtex.
+    """
+
+    def __init__(self, groups: dict=None):
+        """Sets up the index of the given groups.
+
+        Args:
+            groups (dict, optional): Citation keys by group name
+        """
+        self._keys = dict()
+        self._groups = dict()
+
+        for name, keys in (groups or dict()).items():
+            self._keys[name] = tuple(keys)
+
+            for key in keys:
+                self._groups.setdefault(key.lower(), []).append(name)
+
+    @classmethod
+    def from_appdx(cls, appdx: str, start_str: str) -> 'StaticGroups':
+        """Parses the static groups from the appendix of a bibfile.
+
+        Args:
+            appdx (str): The appendix, e.g. as extracted from a BibDesk file
+            start_str (str): The string preceding the property list of the
+                static groups; the property list ends with the block.
+
+        Returns:
+            StaticGroups: The parsed groups; empty, if the appendix holds no
+                static groups
+
+        Raises:
+            ValueError: If the property list is malformed
+        """
+        groups = _parse_plist(appdx, start_str)
+
+        return cls({group['group name']: [key.strip() for key
+                                          in group.get('keys', '').split(',')
+                                          if key.strip()]
+                    for group in groups})
+
+    def __getitem__(self, name: str) -> tuple:
+        """Returns the citation keys of the entries in the given group"""
+        return self._keys[name]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def groups_of(self, key: str) -> tuple:
+        """Returns the names of the groups the given entry is in"""
+        return tuple(self._groups.get(key.lower(), ()))
+
+
+class SmartGroups(Mapping):
+    """A read-only mapping of the names of smart groups to their definition.
+
+    The memberships of all smart groups are evaluated together, in a single
+    pass over the entries: the values of all fields that occur in the
+    conditions are collected column-wise, each distinct condition is then
+    evaluated once on its column, and the groups combine these results.
+
+    As in BibDesk, comparisons are case-insensitive, and missing fields are
+    treated as empty values. Values that are both numbers are compared as
+    numbers. The field names 'Cite Key' and 'BibTeX Type' refer to the key
+    and type of an entry; person fields to the names of the persons.
+
+    Groups that cannot be evaluated, e.g. due to conditions on dates, are
+    skipped with a warning; they are available via the skipped property.
+    """
+
+    def __init__(self, groups=None):
+        """Sets up the smart groups.
+
+        Args:
+            groups (Iterable[SmartGroup], optional): The group definitions
+        """
+        self._groups = OrderedDict()
+        self._skipped = OrderedDict()
+
+        for group in (groups or []):
+            reason = _unsupported(group)
+
+            if reason:
+                warnings.warn("Skipping smart group '{}': {}"
+                              "".format(group.name, reason))
+                self._skipped[group.name] = reason
+                continue
+
+            self._groups[group.name] = group
+
+    @classmethod
+    def from_appdx(cls, appdx: str, start_str: str) -> 'SmartGroups':
+        """Parses the smart groups from the appendix of a bibfile.
+
+        Args:
+            appdx (str): The appendix, e.g. as extracted from a BibDesk file
+            start_str (str): The string preceding the property list of the
+                smart groups; the property list ends with the block.
+
+        Returns:
+            SmartGroups: The parsed groups; empty, if the appendix holds no
+                smart groups
+
+        Raises:
+            ValueError: If the property list is malformed
+        """
+        groups = _parse_plist(appdx, start_str)
+
+        return cls(SmartGroup(name=group['group name'],
+                              conjunction=group.get('conjunction', 0),
+                              conditions=tuple(
+                                  Condition(field=cond['key'],
+                                            comparison=cond['comparison'],
+                                            value=str(cond.get('value', '')))
+                                  for cond in group.get('conditions', [])))
+                   for group in groups)
+
+    @property
+    def skipped(self) -> OrderedDict:
+        """Returns the reasons why groups were skipped, by group name"""
+        return self._skipped
+
+    def __getitem__(self, name: str) -> SmartGroup:
+        """Returns the definition of the given smart group"""
+        return self._groups[name]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def evaluate(self, entries) -> dict:
+        """Determines the entries in each of the smart groups.
+
+        Args:
+            entries: A mapping of citation keys to entries, e.g. the entries
+                of a BibliographyData
+
+        Returns:
+            dict: The citation keys of the entries in each group, as tuples
+                by group name
+        """
+        keys = list(entries.keys())
+        conditions = set(cond for group in self._groups.values()
+                         for cond in group.conditions)
+
+        # Collect the values of all required fields, in a single pass
+        fields = sorted(set(cond.field.lower() for cond in conditions))
+        columns = [[] for _ in fields]
+
+        for key, entry in entries.items():
+            for field, column in zip(fields, columns):
+                column.append(_field_value(key, entry, field).lower())
+
+        columns = dict(zip(fields, columns))
+
+        # Evaluate each distinct condition on its column
+        results = dict()
+        for cond in conditions:
+            compare = COMPARISONS[cond.comparison]
+            value = cond.value.lower()
+            results[cond] = [compare(v, value)
+                             for v in columns[cond.field.lower()]]
+
+        # Combine the results of the conditions of each group
+        members = dict()
+        for name, group in self._groups.items():
+            if not group.conditions:
+                # As in BibDesk, a group without conditions holds all entries
+                members[name] = tuple(keys)
+                continue
+
+            combine = CONJUNCTIONS[group.conjunction]
+            mask = [combine(row) for row
+                    in zip(*(results[cond] for cond in group.conditions))]
+            members[name] = tuple(compress(keys, mask))
+
+        return members
+
+# -----------------------------------------------------------------------------
+
+def _parse_plist(appdx: str, start_str: str) -> list:
+    """Parses the property list following the start string in the appendix.
+
+    Returns:
+        list: The parsed property list; empty, if the start string was not
+            found in the appendix
+
+    Raises:
+        ValueError: If the property list is malformed
+    """
+    start = appdx.find(start_str) if appdx else -1
+    if start < 0:
+        return []
+
+    start += len(start_str)
+    end = appdx.find('</plist>', start)
+    if end < 0:
+        raise ValueError("Unterminated property list following "
+                         "'{}'!".format(start_str))
+
+    plist = appdx[start:end + len('</plist>')].strip()
+
+    try:
+        return plistlib.loads(plist.encode('utf-8'))
+
+    except Exception as err:
+        raise ValueError("Malformed property list following '{}': "
+                         "{}".format(start_str, err)) from err
+
+def _unsupported(group: SmartGroup) -> str:
+    """Returns why the given smart group cannot be evaluated, or None if it
+    can be"""
+    if group.conjunction not in CONJUNCTIONS:
+        return "Unsupported conjunction {}!".format(group.conjunction)
+
+    for cond in group.conditions:
+        if cond.field.lower() in DATE_FIELDS:
+            return ("Conditions on the date field '{}' are not supported!"
+                    "".format(cond.field))
+
+        if cond.comparison not in COMPARISONS:
+            return "Unsupported comparison {}!".format(cond.comparison)
+
+    return None
+
+def _field_value(key: str, entry, field: str) -> str:
+    """Returns the value of the given lower-case field name of an entry, as
+    used in the conditions of smart groups"""
+    if field == 'cite key':
+        return key
+
+    elif field == 'bibtex type':
+        return entry.type
+
+    value = entry.fields.get(field)
+    if value is not None:
+        return value
+
+    if hasattr(entry, 'person_names'):
+        return " and ".join(entry.person_names(field))
+
+    return " and ".join(str(p) for p in entry.persons.get(field, []))
+
+def _as_number(value: str):
+    """Returns the value as float, if possible, or None otherwise"""
+    try:
+        return float(value)
+
+    except ValueError:
+        return None
+
+def _compare(value: str, other: str) -> int:
+    """Compares two values, as numbers if both are numbers; returns -1, 0 or
+    1 if the value is smaller, equal to or larger than the other one"""
+    a, b = _as_number(value), _as_number(other)
+    if a is None or b is None:
+        a, b = value, other
+
+    return (a > b) - (a < b)
+
+# The comparisons of smart group conditions, by their BibDesk code; each is
+# called with the lower-case field value and condition value
+COMPARISONS = {
+    0: lambda v, c: c in v,                 # contains
+    1: lambda v, c: c not in v,             # does not contain
+    2: lambda v, c: v == c,                 # is
+    3: lambda v, c: v != c,                 # is not
+    4: lambda v, c: v.startswith(c),        # starts with
+    5: lambda v, c: v.endswith(c),          # ends with
+    6: lambda v, c: _compare(v, c) < 0,     # smaller than
+    7: lambda v, c: _compare(v, c) > 0,     # larger than
+}
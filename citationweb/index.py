@@ -0,0 +1,466 @@
+"""This module holds the EntryIndex class, which maps the citation keys of a
+bibtex file to the byte ranges of the corresponding entries, such that single
+entries can be parsed without parsing the whole file.
+"""
+
+import copy
+import hashlib
+import marshal
+import os
+import tempfile
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+from pybtex.database import Entry
+
+from citationweb import cache, parsing
+from citationweb.appendix import CommentBlock, comment_kind
+from citationweb.parsing import (EntryParser, iter_blocks, iter_lines,
+                                 open_buffer, parse_block)
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# The changes between two states of a file, as lists of citation keys
+Changes = namedtuple('Changes', ['added', 'changed', 'removed'])
+
+# -----------------------------------------------------------------------------
+
+def file_state(path: str) -> tuple:
+    """Returns size and modification time of the given file, which an index
+    of the file is valid for"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+# -----------------------------------------------------------------------------
+
+class EntryIndex:
+    """An EntryIndex maps the citation keys of a bibtex file to the byte
+    ranges of the corresponding entries.
+
+    Optionally, the index is persisted in the cache directory and is then
+    only rebuilt when the file changed, as detected via its size and
+    modification time. It is stored with marshal, which, unlike pickle,
+    cannot execute code when loading.
+
+    For each entry, the index also holds a fingerprint of its raw bytes, such
+    that two indices of the same file can be compared to find the entries
+    that changed. Note that an index is updated by replacing its attributes,
+    such that a shallow copy of it keeps describing the previous state.
+
+    Comment blocks are indexed as well, by their kind and byte range.
+
+    The index can be built from blocks of the file that are parsed at the
+    same time, see record, such that a file that is parsed anyway is scanned
+    only once.
+    """
+
+    def __init__(self, file: str, persist: bool=None, buf=None,
+                 build: bool=True):
+        """Loads the index of the given file or builds it, if necessary.
+
+        Args:
+            file (str): The bibtex file to index
+            persist (bool, optional): Whether to store the index in the cache
+                directory. If None, uses the value in the configuration.
+            buf (optional): A buffer holding the content of the file, e.g. a
+                memory map, to build the index from. If not given, the file
+                is read.
+            build (bool, optional): If not set, the index is left empty, i.e.
+                not valid, until it is updated, recorded or restored.
+        """
+        self._file = file
+        self._persist = persist if persist is not None else cfg['persist']
+
+        # Attributes describing the index
+        self._state = None
+        self._entries = None
+        self._macros = None
+        self._comments = None
+        self._globals = None
+
+        # Load a persisted index or build a new one
+        if build:
+            self.update(buf=buf)
+
+    # Properties ..............................................................
+
+    @property
+    def file(self) -> str:
+        """Returns the path to the indexed file"""
+        return self._file
+
+    @property
+    def path(self) -> str:
+        """Returns the path to the file the index is persisted to, in the
+        cache directory"""
+        return cache.index_file(self.file)
+
+    @property
+    def state(self) -> tuple:
+        """Returns the state of the indexed file the index describes, see
+        file_state"""
+        return self._state
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether the index is up to date with the indexed file"""
+        return self._state is not None and self._state == self._file_state()
+
+    @property
+    def globals_fingerprint(self) -> bytes:
+        """Returns the fingerprint of all blocks that are not entries but
+        affect them, i.e. @string and @preamble blocks"""
+        return self._globals
+
+    @property
+    def entries_end(self) -> int:
+        """Returns the offset of the end of the last entry in the file, or 0
+        if there are no entries"""
+        return max((start + length
+                    for _, start, length, _ in self._entries.values()),
+                   default=0)
+
+    @property
+    def comments(self) -> tuple:
+        """Returns the comment blocks of the file, as CommentBlock objects
+        in the order of the file"""
+        return self._comments
+
+    # Magic methods ...........................................................
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key.lower() in self._entries
+
+    def __getitem__(self, key: str) -> tuple:
+        """Returns the byte range (offset, length) of the entry with the
+        given key. Keys are case-insensitive, as in pybtex.
+        """
+        return self._entries[key.lower()][1:3]
+
+    def __iter__(self):
+        return (info[0] for info in self._entries.values())
+
+    # Public methods ..........................................................
+
+    def update(self, buf=None) -> bool:
+        """Makes sure the index is up to date with the indexed file.
+
+        If it is not, tries to load the persisted index and, if that is not
+        up to date either, rebuilds it.
+
+        Args:
+            buf (optional): A buffer holding the content of the indexed file,
+                e.g. a memory map, to build the index from. If not given, the
+                file is read.
+
+        Returns:
+            bool: Whether the index was rebuilt
+        """
+        if self.is_valid:
+            return False
+
+        if self._persist and self._load():
+            return False
+
+        self._build(buf=buf)
+        return True
+
+    def record(self, blocks):
+        """Builds the index from the given blocks of the indexed file while
+        passing them on, e.g. to a parser, such that the file is scanned only
+        once. The index is replaced once all blocks were passed on.
+
+        Args:
+            blocks (Iterable[Block]): All blocks of the indexed file in its
+                current state, as yielded by iter_blocks
+
+        Yields:
+            Block: The given blocks
+        """
+        state = self._file_state()
+        entries = dict()
+        macros = []
+        comments = []
+        globals_hash = hashlib.sha1()
+
+        for block in blocks:
+            if block.kind in ('string', 'preamble'):
+                globals_hash.update(block.raw)
+
+                if block.kind == 'string':
+                    macros.append((block.start, block.end - block.start))
+
+            elif block.kind == 'comment':
+                comments.append(CommentBlock(kind=comment_kind(block.raw),
+                                             start=block.start,
+                                             end=block.end))
+
+            elif block.key is not None:
+                # The first entry of a key takes precedence, as in pybtex
+                entries.setdefault(block.key.lower(),
+                                   (block.key, block.start,
+                                    block.end - block.start,
+                                    hashlib.sha1(block.raw).digest()))
+
+            yield block
+
+        self._state = state
+        self._entries = entries
+        self._macros = macros
+        self._comments = tuple(comments)
+        self._globals = globals_hash.digest()
+
+        if self._persist:
+            self._store()
+
+    def dump(self) -> tuple:
+        """Returns the content of the index as a tuple of plain values, which
+        can be stored, e.g. via marshal or pickle, and restored via restore
+        """
+        return (os.path.abspath(self.file), self._state, self._entries,
+                self._macros, tuple(tuple(block) for block in self._comments),
+                self._globals)
+
+    def restore(self, content: tuple) -> bool:
+        """Restores the index from the content returned by dump, if that
+        describes the indexed file in its current state.
+
+        Args:
+            content (tuple): The content of an index, as returned by dump
+
+        Returns:
+            bool: Whether the index was restored
+        """
+        try:
+            path, state, entries, macros, comments, globals_fp = content
+
+        except (TypeError, ValueError):
+            return False
+
+        if path != os.path.abspath(self.file) or state != self._file_state():
+            return False
+
+        self._state = state
+        self._entries = entries
+        self._macros = macros
+        self._comments = tuple(CommentBlock(*block) for block in comments)
+        self._globals = globals_fp
+        return True
+
+    def fingerprint(self, key: str) -> bytes:
+        """Returns the fingerprint of the raw bytes of the given entry"""
+        return self._entries[key.lower()][3]
+
+    def diff(self, other: 'EntryIndex') -> Changes:
+        """Determines the entries that changed with respect to another index
+        of the same file, e.g. a copy from before the file changed.
+
+        Args:
+            other (EntryIndex): The index to compare against
+
+        Returns:
+            Changes: The keys of the entries that were added to, changed in
+                or removed from this index, compared to the other one
+        """
+        added = [info[0] for lkey, info in self._entries.items()
+                 if lkey not in other._entries]
+        changed = [info[0] for lkey, info in self._entries.items()
+                   if lkey in other._entries
+                   and info[3] != other._entries[lkey][3]]
+        removed = [info[0] for lkey, info in other._entries.items()
+                   if lkey not in self._entries]
+
+        return Changes(added=added, changed=changed, removed=removed)
+
+    def splice(self, edits, encoding: str=None) -> 'EntryIndex':
+        """Returns the index of the indexed file after the given edits were
+        applied to it, e.g. by writing.splice_file, without scanning the
+        file again: the ranges of the unchanged blocks are shifted, and only
+        the inserted texts are scanned for blocks.
+
+        The edits may replace and insert entries and comments, but no
+        @string or @preamble blocks. The returned index describes the state
+        of the file at the time this is called, i.e. the file is expected
+        to be edited already.
+
+        Args:
+            edits (Iterable[tuple]): The applied edits, as (start, end, text)
+                tuples that are sorted by start and do not overlap
+            encoding (str, optional): The encoding of the texts; defaults to
+                the encoding given in the configuration of the parsing module.
+
+        Returns:
+            EntryIndex: The index of the edited file
+
+        Raises:
+            ValueError: If an edit inserts a @string or @preamble block
+        """
+        encoding = encoding if encoding else parsing.cfg['encoding']
+
+        edits = [(start, end, text.encode(encoding))
+                 for start, end, text in edits]
+        ends = [end for _, end, _ in edits]
+        shifts = [0] + list(accumulate(len(raw) - (end - start)
+                                       for start, end, raw in edits))
+
+        def shifted(pos: int) -> int:
+            """Returns the new offset of an unchanged block, or None if the
+            block was replaced by an edit"""
+            i = bisect_right(ends, pos)
+            if i < len(edits) and edits[i][0] <= pos:
+                return None
+
+            return pos + shifts[i]
+
+        # The unchanged blocks, at their new offsets
+        entries = []
+        for key, start, length, fingerprint in self._entries.values():
+            new_start = shifted(start)
+            if new_start is not None:
+                entries.append((new_start, key, length, fingerprint))
+
+        macros = []
+        for start, length in self._macros:
+            new_start = shifted(start)
+            if new_start is not None:
+                macros.append((new_start, length))
+
+        comments = []
+        for block in self._comments:
+            new_start = shifted(block.start)
+            if new_start is not None:
+                comments.append(block._replace(
+                    start=new_start, end=new_start + block.end - block.start))
+
+        # The blocks of the inserted texts
+        for (start, _, raw), shift in zip(edits, shifts):
+            for block in iter_blocks(iter_lines(raw), encoding=encoding):
+                if block.kind in ('string', 'preamble'):
+                    raise ValueError("Cannot splice @{} blocks into the "
+                                     "index!".format(block.kind))
+
+                offset = start + shift + block.start
+
+                if block.kind == 'comment':
+                    comments.append(CommentBlock(
+                        kind=comment_kind(block.raw), start=offset,
+                        end=offset + len(block.raw)))
+
+                elif block.key is not None:
+                    entries.append((offset, block.key, len(block.raw),
+                                    hashlib.sha1(block.raw).digest()))
+
+        index = copy.copy(self)
+        index._state = self._file_state()
+        index._entries = dict()
+        index._macros = macros
+        index._comments = tuple(sorted(comments,
+                                       key=lambda block: block.start))
+
+        # The first entry of a key takes precedence, as in pybtex
+        for start, key, length, fingerprint in sorted(entries):
+            index._entries.setdefault(key.lower(),
+                                      (key, start, length, fingerprint))
+
+        if index._persist:
+            index._store()
+
+        return index
+
+    def parse(self, key: str, **parser_kwargs) -> Entry:
+        """Parses the entry with the given key.
+
+        The @string macros defined before the entry are parsed as well, such
+        that the entry can make use of them.
+
+        Args:
+            key (str): The citation key of the entry
+            **parser_kwargs: Passed on to the EntryParser
+
+        Returns:
+            Entry: The parsed entry
+
+        Raises:
+            KeyError: If there is no entry with the given key or if it was
+                dropped by the parser, e.g. due to a predicate
+        """
+        start, length = self[key]
+        parser = EntryParser(**parser_kwargs)
+
+        with open_buffer(self.file) as buf:
+            raw = [buf[m_start:m_start + m_length]
+                   for m_start, m_length in self._macros if m_start < start]
+            raw.append(buf[start:start + length])
+
+        # Parse macros and entry; the entry is the last block
+        for block in iter_blocks(raw):
+            entries = list(parse_block(parser, block))
+
+        if not entries:
+            raise KeyError(key)
+
+        return entries[0][1]
+
+    # Private methods .........................................................
+
+    def _file_state(self) -> tuple:
+        """Returns the current state of the indexed file"""
+        return file_state(self.file)
+
+    def _build(self, buf=None):
+        """Builds the index by scanning the indexed file or the given buffer
+        holding its content"""
+        if buf is None:
+            with open_buffer(self.file) as buf:
+                return self._build(buf=buf)
+
+        for _ in self.record(iter_blocks(iter_lines(buf))):
+            pass
+
+    def _load(self) -> bool:
+        """Loads the persisted index, if it is up to date.
+
+        Returns:
+            bool: Whether the persisted index was loaded
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                content = marshal.load(f)
+
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+        return self.restore(content)
+
+    def _store(self):
+        """Persists the index in the cache directory, atomically. Failing to
+        do so is not an error, as the index can be rebuilt anyway."""
+        try:
+            os.makedirs(cache.CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache.CACHE_DIR,
+                                            suffix='.tmp')
+
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump(self.dump(), f)
+
+            os.replace(tmp_path, self.path)
+
+        except OSError:
+            os.remove(tmp_path)
+            return
+
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        cache.prune()
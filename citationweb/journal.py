@@ -0,0 +1,220 @@
+"""This module holds the ChangeJournal, which records the modifications of
+bibliography data, and the tracked containers that report modifications of
+entries and their fields to it.
+
+Tracked containers are drop-in replacements for the case-insensitive dicts
+pybtex uses for entries and fields; they are pickled as the latter.
+"""
+
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from pybtex.utils import OrderedCaseInsensitiveDict
+
+# Local constants
+# A recorded change: its sequence number, the operation, the citation key of
+# the entry and, for field operations, the name of the field
+Change = namedtuple('Change', ['seq', 'op', 'key', 'field'])
+
+# -----------------------------------------------------------------------------
+
+class ChangeJournal:
+    """A ChangeJournal records the modifications of bibliography entries and
+    keeps track of the entries that are dirty, i.e. were modified since the
+    data was loaded or saved.
+
+    Attributes:
+        OPS (tuple): The operations that are recorded
+    """
+    # Class variables
+    OPS = ('set_field', 'del_field', 'add_entry', 'set_entry',
+           'remove_entry', 'mark')
+
+    def __init__(self):
+        """Sets up an empty ChangeJournal"""
+        self._changes = []
+        self._dirty = OrderedDict()     # lower-case key -> key
+        self._paused = False
+
+    # Properties ..............................................................
+
+    @property
+    def seq(self) -> int:
+        """Returns the sequence number the next change will get; pass it to
+        changes or dirty_since later, to get the changes after this point"""
+        return len(self._changes)
+
+    @property
+    def dirty(self) -> list:
+        """Returns the citation keys of the dirty entries, in the order they
+        were first modified"""
+        return list(self._dirty.values())
+
+    # Magic methods ...........................................................
+
+    def __len__(self) -> int:
+        return len(self._changes)
+
+    # Public methods ..........................................................
+
+    def record(self, op: str, key: str, field: str=None):
+        """Records a change of the given entry and marks it dirty.
+
+        Args:
+            op (str): The operation, one of OPS
+            key (str): The citation key of the entry
+            field (str, optional): The name of the field, for field operations
+
+        Raises:
+            ValueError: On an invalid operation
+        """
+        if op not in self.OPS:
+            raise ValueError("Invalid operation '{}'! Valid operations are: "
+                             "{}".format(op, ", ".join(self.OPS)))
+
+        if self._paused:
+            return
+
+        self._changes.append(Change(seq=len(self._changes), op=op, key=key,
+                                    field=field))
+        self._dirty.setdefault(key.lower(), key)
+
+    def is_dirty(self, key: str) -> bool:
+        """Whether the given entry is dirty"""
+        return key.lower() in self._dirty
+
+    def changes(self, since: int=0, key: str=None, op: str=None) -> list:
+        """Returns the recorded changes, optionally filtered.
+
+        Args:
+            since (int, optional): Only changes with at least this sequence
+                number are returned
+            key (str, optional): Only changes of this entry are returned
+            op (str, optional): Only changes of this operation are returned
+
+        Returns:
+            list: The Change objects, in the order they were recorded
+        """
+        return [change for change in self._changes[since:]
+                if (key is None or change.key.lower() == key.lower())
+                and (op is None or change.op == op)]
+
+    def dirty_since(self, since: int) -> list:
+        """Returns the citation keys of the entries that were changed since
+        the given sequence number, in the order they were first changed"""
+        keys = OrderedDict()
+        for change in self._changes[since:]:
+            keys.setdefault(change.key.lower(), change.key)
+
+        return list(keys.values())
+
+    def clean(self, keys=None):
+        """Marks the given entries or, if no keys are given, all entries as
+        no longer dirty, e.g. after saving them. The recorded changes are
+        kept."""
+        if keys is None:
+            self._dirty.clear()
+            return
+
+        for key in keys:
+            self._dirty.pop(key.lower(), None)
+
+    @contextmanager
+    def paused(self):
+        """A context in which no changes are recorded, e.g. while loading"""
+        paused = self._paused
+        self._paused = True
+
+        try:
+            yield self
+
+        finally:
+            self._paused = paused
+
+# -----------------------------------------------------------------------------
+
+class TrackedFields(OrderedCaseInsensitiveDict):
+    """The fields of an entry, reporting modifications to a ChangeJournal"""
+    _journal = None
+    _key = None
+
+    def __setitem__(self, name: str, value: str):
+        super().__setitem__(name, value)
+
+        if self._journal is not None:
+            self._journal.record('set_field', self._key, field=name)
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+
+        if self._journal is not None:
+            self._journal.record('del_field', self._key, field=name)
+
+    def __reduce__(self):
+        return (OrderedCaseInsensitiveDict, (list(self.items()),))
+
+
+class TrackedEntries(OrderedCaseInsensitiveDict):
+    """A mapping of citation keys to entries, reporting the addition and
+    removal of entries to a ChangeJournal; the fields of added entries are
+    tracked as well."""
+    _journal = None
+
+    def __setitem__(self, key: str, entry):
+        op = 'set_entry' if key in self else 'add_entry'
+        super().__setitem__(key, entry)
+
+        if self._journal is not None:
+            track_fields(entry, key, self._journal)
+            self._journal.record(op, key)
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+
+        if self._journal is not None:
+            self._journal.record('remove_entry', key)
+
+    def __reduce__(self):
+        return (OrderedCaseInsensitiveDict, (list(self.items()),))
+
+# -----------------------------------------------------------------------------
+
+def track(entries, journal: ChangeJournal) -> TrackedEntries:
+    """Makes the given entries and their fields report modifications to the
+    given journal.
+
+    Args:
+        entries: The entries, e.g. those of a BibliographyData
+        journal (ChangeJournal): The journal to report to
+
+    Returns:
+        TrackedEntries: The tracked entries; to be used instead of the given
+            ones, which may have been converted in place
+    """
+    entries = _tracked(entries, TrackedEntries, journal)
+
+    for key, entry in entries.items():
+        track_fields(entry, key, journal)
+
+    return entries
+
+def track_fields(entry, key: str, journal: ChangeJournal):
+    """Makes the fields of the given entry report modifications to the given
+    journal, unless they are read-only"""
+    if hasattr(entry.fields, '__setitem__'):
+        entry.fields = _tracked(entry.fields, TrackedFields, journal, key=key)
+
+def _tracked(obj, cls, journal: ChangeJournal, key: str=None):
+    """Returns the given mapping as an object of the given tracked class"""
+    if type(obj) is OrderedCaseInsensitiveDict:
+        # Switch the class in place instead of copying all items
+        obj.__class__ = cls
+
+    elif not isinstance(obj, cls):
+        obj = cls(obj.items())
+
+    obj._journal = journal
+    if key is not None:
+        obj._key = key
+
+    return obj
@@ -0,0 +1,684 @@
+"""This module holds the low-level tools to split a bibtex file into its
+top-level blocks and to parse these blocks into pybtex entries one at a time.
+"""
+
+import mmap
+import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pybtex.bibtex.utils import split_name_list
+from pybtex.database import BibliographyData, Entry, Person
+from pybtex.database.input.bibtex import DuplicateField, Parser
+from pybtex.textutils import normalize_whitespace
+from pybtex.utils import CaseInsensitiveSet
+
+from citationweb import compression
+from citationweb.entries import LazyEntry
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# A top-level block of a bibtex file, i.e. everything from an `@` to the
+# closing delimiter. The start and end are byte offsets into the file, raw
+# holds the bytes of the block.
+Block = namedtuple('Block', ['kind', 'key', 'start', 'end', 'raw'])
+
+# Block kinds that do not describe an entry
+NON_ENTRY_KINDS = ('comment', 'preamble', 'string')
+
+# The header of a block, e.g. `@article{`
+_HEADER = re.compile(rb'@\s*([A-Za-z][^\s{(]*)\s*([{(])')
+
+# The delimiters relevant for finding the end of a block; in blocks delimited
+# by parentheses, a closing parenthesis may also be part of a quoted value
+_DELIMS = re.compile(rb'[{}]')
+_PAREN_DELIMS = re.compile(rb'[{}()"]')
+
+# Patterns of the fast tokenizer, for entries with one field per line
+_FAST_HEADER = re.compile(r'@([A-Za-z][\w-]*)\{([^\s,}]+),[ \t\r]*$')
+_FAST_FIELD = re.compile(r'[ \t]+([A-Za-z][\w-]*) = \{(.*)\}(,?)[ \t\r]*$')
+_FAST_BRACES = re.compile(r'[{}]')
+
+# -----------------------------------------------------------------------------
+
+class EntryParser(Parser):
+    """The bibtex parser used throughout citationweb; a pybtex Parser that
+    can be configured to defer processing of the entries, to keep only some
+    of their fields, and to drop entries while parsing.
+    """
+
+    def __init__(self, *args, lazy_fields: bool=False, fields=None,
+                 where=None, fast: bool=False, **kwargs):
+        """Sets up the parser.
+
+        Args:
+            *args: Passed on to the pybtex Parser
+            lazy_fields (bool, optional): If set, creates LazyEntry objects,
+                which parse person fields and decode LaTeX only on access.
+            fields (Iterable[str], optional): If given, only these fields
+                (including person fields) are kept; case-insensitive.
+            where (Callable, optional): If given, only entries for which
+                this predicate returns True are kept. It is called with the
+                entry before its persons are added, i.e. it should only
+                depend on type, key and fields of the entry.
+            fast (bool, optional): If set, uses a fast tokenizer for entries
+                that are written with one `Name = {value},` field per line,
+                as done by e.g. BibDesk. All other blocks are parsed by the
+                pybtex tokenizer. The resulting entries are the same.
+            **kwargs: Passed on to the pybtex Parser
+        """
+        super().__init__(*args, **kwargs)
+
+        self.fast = fast
+
+        self.lazy_fields = lazy_fields
+        self.fields = None
+        if fields is not None:
+            self.fields = CaseInsensitiveSet(fields)
+        self.where = where
+
+    def process_entry(self, entry_type: str, key: str, fields: list):
+        """Creates an entry from the parsed fields and adds it to the data,
+        if it satisfies the predicate"""
+        if not (self.lazy_fields or self.fields is not None or self.where):
+            return super().process_entry(entry_type, key, fields)
+
+        if self.lazy_fields:
+            entry = LazyEntry(entry_type)
+
+        else:
+            entry = Entry(entry_type)
+
+        if key is None:
+            key = "unnamed-{}".format(self.unnamed_entry_counter)
+            self.unnamed_entry_counter += 1
+
+        entry.key = key
+        persons = []
+
+        seen_fields = set()
+        for field_name, field_value_list in fields:
+            if self.fields is not None and field_name not in self.fields:
+                continue
+
+            if field_name.lower() in seen_fields:
+                self.handle_error(DuplicateField(key, field_name))
+                continue
+
+            field_value = normalize_whitespace("".join(field_value_list))
+
+            if field_name in self.person_fields:
+                persons.append((field_name, field_value))
+
+            else:
+                entry.fields[field_name] = field_value
+
+            seen_fields.add(field_name.lower())
+
+        if self.where and not self.where(entry):
+            return
+
+        for role, names in persons:
+            if self.lazy_fields:
+                entry.add_raw_persons(role, names)
+
+            else:
+                for name in split_name_list(names):
+                    entry.add_person(Person(name), role)
+
+        self.data.add_entry(key, entry)
+
+    def parse_string(self, text: str) -> BibliographyData:
+        """Parses the given bibtex string, adding the entries to the data"""
+        if not self.fast:
+            return super().parse_string(text)
+
+        # Split into blocks starting on a new line; the first one may be text
+        # before any block, which needs no parsing unless it contains an `@`
+        blocks = re.split(r'\n(?=@)', text)
+        if not blocks[0].startswith('@') and '@' not in blocks[0]:
+            blocks = blocks[1:]
+
+        # Blocks the fast tokenizer cannot handle are collected and parsed
+        # together, as they might be parts of the same block
+        pending = []
+
+        for block in blocks:
+            tokens = self._tokenize_fast(block)
+
+            if tokens is None:
+                pending.append(block)
+                continue
+
+            if pending:
+                super().parse_string('\n'.join(pending))
+                pending = []
+
+            self.process_entry(*tokens)
+
+        if pending:
+            super().parse_string('\n'.join(pending))
+
+        return self.data
+
+    @staticmethod
+    def _tokenize_fast(block: str) -> tuple:
+        """Tries to tokenize a single block using the fast tokenizer.
+
+        Returns:
+            tuple: The entry type, key and fields of the entry, as expected by
+                process_entry, or None if the block needs to be parsed by the
+                pybtex tokenizer.
+        """
+        lines = block.split('\n')
+
+        header = _FAST_HEADER.match(lines[0])
+        if not header:
+            return None
+
+        entry_type, key = header.groups()
+        if entry_type.lower() in NON_ENTRY_KINDS:
+            return None
+
+        fields = []
+        closed = False      # whether the entry was closed
+        expect_end = False  # whether the entry needs to be closed next
+
+        for line in lines[1:]:
+            if closed:
+                # Only comments may follow; pybtex would parse any `@`
+                if '@' in line:
+                    return None
+                continue
+
+            if line.strip() == '}':
+                closed = True
+                continue
+
+            field = _FAST_FIELD.match(line)
+            if not field or expect_end:
+                return None
+
+            name, value, comma = field.groups()
+
+            if _balanced(value):
+                expect_end = not comma
+
+            elif not comma and value.endswith('}') and _balanced(value[:-1]):
+                # The last field, followed by the end of the entry
+                value = value[:-1]
+                closed = True
+
+            else:
+                return None
+
+            fields.append((name, [value]))
+
+        if not closed:
+            return None
+
+        return entry_type, key, fields
+
+# -----------------------------------------------------------------------------
+
+@contextmanager
+def open_buffer(path: str):
+    """Memory-maps the given file for reading.
+
+    The buffer can be shared by everything that needs to read the file, such
+    that it is read from disk at most once. Compressed files cannot be
+    memory-mapped; they are decompressed as a stream into memory instead.
+    Byte offsets then refer to the decompressed content.
+
+    Args:
+        path (str): The path to the file
+
+    Yields:
+        The read-only buffer; a memory map or, for empty or compressed
+            files, bytes
+    """
+    if compression.detect(path):
+        with compression.open_stream(path) as f:
+            yield f.read()
+            return
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be memory-mapped
+            yield b''
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+def read_ends(path: str, size: int) -> tuple:
+    """Reads the first and the last bytes of a file, without reading the
+    part in between. Compressed files are decompressed as a stream, keeping
+    only the last bytes in memory.
+
+    Args:
+        path (str): The path to the file
+        size (int): The number of bytes to read at either end
+
+    Returns:
+        tuple: The head and the tail of the file, as bytes; they overlap if
+            the file is smaller than twice the size.
+    """
+    compressed = compression.detect(path)
+
+    with compression.open_stream(path, compressed) as f:
+        head = f.read(size)
+
+        if not compressed:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(max(end - size, 0))
+            return head, f.read()
+
+        tail = head
+        for chunk in iter(lambda: f.read(size), b''):
+            tail = (tail + chunk)[-size:]
+
+        return head, tail
+
+def iter_lines(buf):
+    """Iterates over the lines of a buffer, keeping the line endings.
+
+    Args:
+        buf: A bytes-like object supporting find, e.g. a memory map
+
+    Yields:
+        bytes: The lines of the buffer
+    """
+    pos = 0
+    size = len(buf)
+
+    while pos < size:
+        end = buf.find(b'\n', pos) + 1 or size
+        yield buf[pos:end]
+        pos = end
+
+def iter_blocks(stream, encoding: str=None):
+    """Splits a binary stream of a bibtex file into its top-level blocks.
+
+    The stream is read line by line, such that at most a single block is held
+    in memory at any time. Text outside of blocks is skipped, as it is a
+    comment by bibtex convention.
+
+    Args:
+        stream: A binary, line-iterable stream, e.g. a file opened with 'rb'
+        encoding (str, optional): The encoding used to decode the keys;
+            defaults to the encoding given in the configuration.
+
+    Yields:
+        Block: The blocks of the file, in the order of the file
+    """
+    encoding = encoding if encoding else cfg['encoding']
+
+    pos = 0         # byte offset of the start of the current line
+    parts = None    # parts of the current block; None if outside a block
+    start = None    # byte offset of the start of the current block
+    kind = None     # lower-case name of the current block, e.g. 'article'
+    key_pos = None  # offset of the key relative to the start of the block
+    paren = False   # whether the current block is delimited by parentheses
+    depth = 0       # the current brace depth within the block
+    quoted = False  # whether within a quoted value, at brace depth 0
+
+    for line in stream:
+        i = 0
+
+        while i < len(line):
+            if parts is None:
+                # Outside of a block; look for the start of the next one
+                at = line.find(b'@', i)
+                if at < 0:
+                    break
+
+                match = _HEADER.match(line, at)
+                if not match:
+                    # Not a valid block header; skip this character
+                    i = at + 1
+                    continue
+
+                parts = []
+                start = pos + at
+                kind = match.group(1).decode(encoding).lower()
+                key_pos = match.end() - at
+                paren = (match.group(2) == b'(')
+                depth = 0 if paren else 1
+                quoted = False
+                i = at
+                j = match.end()
+
+            else:
+                j = i
+
+            # Within a block. Check if it can end on this line at all; if not,
+            # the delimiters need not be looked at one by one.
+            if paren:
+                can_end = (line.find(b')', j) >= 0
+                           or line.find(b'"', j) >= 0)
+            else:
+                can_end = (depth - line.count(b'}', j) <= 0)
+
+            if not can_end:
+                depth += line.count(b'{', j) - line.count(b'}', j)
+                parts.append(line[i:])
+                break
+
+            end = None
+            for delim in (_PAREN_DELIMS if paren else _DELIMS).finditer(line,
+                                                                         j):
+                char = delim.group()
+                if char == b'{':
+                    depth += 1
+                elif char == b'}':
+                    depth -= 1
+                    if depth == 0 and not paren:
+                        end = delim.end()
+                        break
+                elif depth > 0:
+                    continue
+                elif char == b'"':
+                    quoted = not quoted
+                elif char == b')' and not quoted:
+                    end = delim.end()
+                    break
+
+            if end is None:
+                parts.append(line[i:])
+                break
+
+            # Reached the end of the block
+            parts.append(line[i:end])
+            yield _make_block(kind, start, key_pos, b''.join(parts), encoding)
+
+            parts = None
+            i = end
+
+        pos += len(line)
+
+    if parts is not None:
+        # Unterminated block; yield it nevertheless such that the parser can
+        # report the error
+        yield _make_block(kind, start, key_pos, b''.join(parts), encoding)
+
+
+def iter_entries(stream, encoding: str=None, **parser_kwargs):
+    """Parses the blocks of a binary stream of a bibtex file one at a time.
+
+    Macros defined via @string are kept for the entries that follow them.
+
+    Args:
+        stream: A binary, line-iterable stream, e.g. a file opened with 'rb'
+        encoding (str, optional): The encoding of the stream; defaults to the
+            encoding given in the configuration.
+        **parser_kwargs: Passed on to the EntryParser
+
+    Yields:
+        Tuple[str, Entry]: The citation key and the corresponding entry
+    """
+    encoding = encoding if encoding else cfg['encoding']
+
+    yield from iter_block_entries(iter_blocks(stream, encoding=encoding),
+                                  encoding=encoding, **parser_kwargs)
+
+def iter_block_entries(blocks, encoding: str=None, **parser_kwargs):
+    """Parses the given top-level blocks of a bibtex file one at a time.
+
+    Like iter_entries, but for blocks that were already split, e.g. blocks
+    that are also consumed by something else, like an entry index.
+
+    Args:
+        blocks (Iterable[Block]): The blocks, as yielded by iter_blocks
+        encoding (str, optional): The encoding of the blocks; defaults to the
+            encoding given in the configuration.
+        **parser_kwargs: Passed on to the EntryParser
+
+    Yields:
+        Tuple[str, Entry]: The citation key and the corresponding entry
+    """
+    encoding = encoding if encoding else cfg['encoding']
+    parser = EntryParser(encoding=encoding, **parser_kwargs)
+
+    for block in blocks:
+        yield from parse_block(parser, block, encoding=encoding)
+
+
+def parse_block(parser: EntryParser, block: Block, encoding: str=None):
+    """Parses a single block with the given parser.
+
+    The parser keeps the macros of @string blocks, but not the entries: these
+    are only yielded.
+
+    Args:
+        parser (EntryParser): The parser to use
+        block (Block): The block to parse
+        encoding (str, optional): The encoding of the block; defaults to the
+            encoding given in the configuration.
+
+    Yields:
+        Tuple[str, Entry]: The citation key and the corresponding entry
+    """
+    if block.kind in ('comment', 'preamble'):
+        return
+
+    encoding = encoding if encoding else cfg['encoding']
+
+    parser.data = BibliographyData()
+    parser.parse_string(block.raw.decode(encoding))
+
+    yield from parser.data.entries.items()
+
+
+def parse_buffer(buf, filename: str=None, encoding: str=None,
+                 **parser_kwargs) -> BibliographyData:
+    """Parses a buffer holding the content of a bibtex file.
+
+    Args:
+        buf: A bytes-like object, e.g. a memory map
+        filename (str, optional): The name of the file, used in errors
+        encoding (str, optional): The encoding of the buffer; defaults to the
+            encoding given in the configuration.
+        **parser_kwargs: Passed on to the EntryParser
+
+    Returns:
+        BibliographyData: The parsed data
+    """
+    encoding = encoding if encoding else cfg['encoding']
+
+    parser = EntryParser(encoding=encoding, **parser_kwargs)
+    if filename:
+        parser.filename = filename
+
+    return parser.parse_string(buf[:].decode(encoding))
+
+def parse_blocks(blocks, filename: str=None, encoding: str=None,
+                 **parser_kwargs) -> BibliographyData:
+    """Parses the top-level blocks of a bibtex file into a single
+    BibliographyData, as parsing the whole file at once would.
+
+    As the blocks need to be split only once, they can be consumed by
+    something else at the same time, e.g. an entry index, without scanning
+    the file twice. Comment blocks are skipped.
+
+    Args:
+        blocks (Iterable[Block]): The blocks, as yielded by iter_blocks
+        filename (str, optional): The name of the file, used in errors
+        encoding (str, optional): The encoding of the blocks; defaults to the
+            encoding given in the configuration.
+        **parser_kwargs: Passed on to the EntryParser
+
+    Returns:
+        BibliographyData: The parsed data
+    """
+    encoding = encoding if encoding else cfg['encoding']
+
+    parser = EntryParser(encoding=encoding, **parser_kwargs)
+    if filename:
+        parser.filename = filename
+
+    for block in blocks:
+        if block.kind != 'comment':
+            parser.parse_string(block.raw.decode(encoding))
+
+    return parser.data
+
+def parse_parallel(buf, workers: int=None, chunk_size: int=None,
+                   encoding: str=None, blocks=None,
+                   **parser_kwargs) -> BibliographyData:
+    """Parses a bibtex file in chunks, distributed over a pool of processes.
+
+    The file is split at the boundaries of its top-level blocks into chunks
+    of roughly the given size. As the @string macros of a chunk may be needed
+    by the following chunks, the macro definitions of all preceding chunks
+    are prepended to each chunk.
+
+    Args:
+        buf: A bytes-like object holding the content of the bibtex file,
+            e.g. a memory map
+        workers (int, optional): The number of worker processes; if not
+            given, uses as many as there are CPUs.
+        chunk_size (int, optional): The target size of the chunks in bytes;
+            defaults to the value given in the configuration. To make use of
+            all workers, smaller chunks are used for small files.
+        encoding (str, optional): The encoding of the file; defaults to the
+            encoding given in the configuration.
+        blocks (Iterable[Block], optional): The blocks of the file, if these
+            are split already; otherwise, the buffer is split into blocks.
+        **parser_kwargs: Passed on to the EntryParser in the workers
+
+    Returns:
+        BibliographyData: The parsed data, with the entries in the order of
+            the file
+    """
+    workers = workers if workers else os.cpu_count()
+    chunk_size = chunk_size if chunk_size else cfg['parallel']['chunk_size']
+    chunk_size = min(chunk_size, len(buf) // (4 * workers) + 1)
+    encoding = encoding if encoding else cfg['encoding']
+
+    if blocks is None:
+        blocks = iter_blocks(iter_lines(buf), encoding=encoding)
+
+    # Split the file into chunks
+    chunks = []
+    macros = []
+    chunk = []
+    size = 0
+
+    for block in blocks:
+        if block.kind == 'comment':
+            continue
+
+        chunk.append(block)
+        size += len(block.raw)
+
+        if size >= chunk_size:
+            chunks.append(b'\n'.join(macros + [b.raw for b in chunk]))
+            macros += [b.raw for b in chunk if b.kind == 'string']
+            chunk = []
+            size = 0
+
+    if chunk:
+        chunks.append(b'\n'.join(macros + [b.raw for b in chunk]))
+
+    # Parse them in parallel and merge the results in the original order;
+    # multiprocessing is only imported if needed
+    from concurrent.futures import ProcessPoolExecutor
+    data = BibliographyData()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_parse_chunk, chunks,
+                               [encoding] * len(chunks),
+                               [parser_kwargs] * len(chunks))
+
+        for entries, preamble in results:
+            data.add_entries(entries)
+            data.add_to_preamble(*preamble)
+
+    return data
+
+def extract_appdx(buf, start_str: str, encoding: str=None) -> str:
+    """Extracts the appendix of a bibtex file, i.e. the blocks at the end of
+    the file that are on lines starting with start_str.
+
+    The appendix is searched for backwards from the end of the buffer, block
+    by block, until reaching a line starting with `@` that is not part of the
+    appendix. For a memory-mapped file, only the pages at the end of the file
+    are thus read. The appendix is decoded directly from the buffer.
+
+    Args:
+        buf: A bytes-like object holding the content of the bibtex file,
+            e.g. a memory map
+        start_str (str): The string that indicates the start of the appdx
+        encoding (str, optional): The encoding of the buffer; defaults to the
+            encoding given in the configuration.
+
+    Returns:
+        str: The appendix; empty if there is none
+    """
+    encoding = encoding if encoding else cfg['encoding']
+    start = start_str.encode(encoding)
+
+    # Walk backwards over the lines starting with `@`, as long as they are
+    # part of the appendix
+    pos = len(buf)
+
+    while pos > 0:
+        prev = _rfind_line_start(buf, b'@', pos)
+        if prev < 0 or buf[prev:prev + len(start)] != start:
+            break
+
+        pos = prev
+
+    if pos == len(buf):
+        return ''
+
+    with memoryview(buf) as view, view[pos:] as appdx:
+        return str(appdx, encoding)
+
+# -----------------------------------------------------------------------------
+
+def _parse_chunk(raw: bytes, encoding: str, parser_kwargs: dict) -> tuple:
+    """Parses a chunk of a bibtex file; used by the worker processes"""
+    parser = EntryParser(encoding=encoding, **parser_kwargs)
+    data = parser.parse_string(raw.decode(encoding))
+    return list(data.entries.items()), data.preamble_list
+
+def _balanced(value: str) -> bool:
+    """Whether the braces in the given string are balanced"""
+    if '{' not in value and '}' not in value:
+        return True
+
+    depth = 0
+    for brace in _FAST_BRACES.finditer(value):
+        depth += 1 if brace.group() == '{' else -1
+        if depth < 0:
+            return False
+
+    return depth == 0
+
+def _rfind_line_start(buf, sub: bytes, end: int) -> int:
+    """Returns the offset of the last line before end that starts with sub,
+    or -1 if there is no such line."""
+    pos = buf.rfind(b'\n' + sub, 0, end)
+    if pos >= 0:
+        return pos + 1
+
+    if end >= len(sub) and buf[:len(sub)] == sub:
+        return 0
+
+    return -1
+
+def _make_block(kind: str, start: int, key_pos: int, raw: bytes,
+                encoding: str) -> Block:
+    """Creates a Block object, extracting the key for entry blocks"""
+    key = None
+    if kind not in NON_ENTRY_KINDS:
+        key = re.split(rb'[,\s})]', raw[key_pos:].lstrip(), 1)[0]
+        key = key.decode(encoding)
+
+    return Block(kind=kind, key=key, start=start, end=start + len(raw),
+                 raw=raw)
@@ -0,0 +1,337 @@
+"""This module holds a compact, read-only store for bibliography entries.
+
+Instead of one pybtex Entry with its own dicts per entry, the CompactData
+keeps all entries in a few shared arrays: every string — entry types, field
+names, field values, and raw person fields — is stored once in a string
+table, and the entries only hold the integer ids of their strings. Entries
+are accessed through lightweight views, which provide the same read
+interface as the pybtex classes.
+
+The string tables are also used to intern values of regular entries, such
+that repeated values like journals or author names are held only once and
+can be compared via their integer ids.
+"""
+
+from array import array
+from collections.abc import Mapping
+
+from pybtex.bibtex.utils import split_name_list
+from pybtex.database import BibliographyDataError, Person
+from pybtex.errors import report_error
+from pybtex.utils import OrderedCaseInsensitiveDict
+
+# -----------------------------------------------------------------------------
+
+class StringTable:
+    """A StringTable maps strings to integer ids and back; each distinct
+    string is stored only once.
+    """
+    __slots__ = ('_strings', '_ids')
+
+    def __init__(self):
+        """Sets up an empty StringTable"""
+        self._strings = []
+        self._ids = dict()
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, sid: int) -> str:
+        """Returns the string with the given id"""
+        return self._strings[sid]
+
+    def __contains__(self, s: str) -> bool:
+        return s in self._ids
+
+    def intern(self, s: str) -> int:
+        """Returns the id of the given string, adding it if necessary"""
+        try:
+            return self._ids[s]
+
+        except KeyError:
+            sid = len(self._strings)
+            self._strings.append(s)
+            self._ids[s] = sid
+            return sid
+
+    def id(self, s: str) -> int:
+        """Returns the id of the given string.
+
+        Raises:
+            KeyError: If the string is not in the table
+        """
+        return self._ids[s]
+
+    def __getstate__(self):
+        return self._strings
+
+    def __setstate__(self, strings: list):
+        self._strings = strings
+        self._ids = {s: sid for sid, s in enumerate(strings)}
+
+# -----------------------------------------------------------------------------
+
+class CompactData:
+    """A read-only, compact store of bibliography entries.
+
+    Its entries attribute is a read-only mapping of citation keys to entry
+    views, similar to the entries of a pybtex BibliographyData.
+    """
+
+    def __init__(self):
+        """Sets up an empty CompactData object; use add_entry to fill it"""
+        self.strings = StringTable()
+
+        self._keys = []                     # citation key of each entry
+        self._lookup = dict()               # lower-case key -> entry index
+        self._types = array('L')            # string id of each entry type
+        self._offsets = array('L', [0])     # start of each entry's fields
+        self._names = array('L')            # string id of each field name
+        self._values = array('L')           # string id of each field value
+        self._persons = array('b')          # whether it is a person field
+
+        self.entries = EntriesView(self)
+
+    @classmethod
+    def from_entries(cls, entries) -> 'CompactData':
+        """Creates a CompactData object from an iterable of entries.
+
+        Args:
+            entries: Iterable of (key, entry) pairs, e.g. the items of the
+                entries of a BibliographyData
+
+        Returns:
+            CompactData: The store holding the given entries
+        """
+        data = cls()
+
+        for key, entry in entries:
+            data.add_entry(key, entry)
+
+        return data
+
+    def add_entry(self, key: str, entry):
+        """Adds an entry to the store; it is converted to the compact form,
+        such that the entry itself need not be kept.
+
+        Person fields are stored as raw strings. For a LazyEntry, its raw
+        person fields are used directly, without parsing them. As in pybtex,
+        repeated entries are reported as errors.
+        """
+        if key.lower() in self._lookup:
+            report_error(BibliographyDataError("repeated bibliography entry: "
+                                               "{}".format(key)))
+            return
+
+        self._lookup[key.lower()] = len(self._keys)
+        self._keys.append(key)
+        self._types.append(self.strings.intern(entry.original_type))
+
+        intern = self.strings.intern
+
+        for name, value in entry.fields.items():
+            self._names.append(intern(name))
+            self._values.append(intern(value))
+            self._persons.append(False)
+
+        persons = getattr(entry, '_raw_persons', None)
+        if not persons:
+            persons = {role: " and ".join(str(p) for p in people)
+                       for role, people in entry.persons.items()}
+
+        for role, names in persons.items():
+            self._names.append(intern(role))
+            self._values.append(intern(names))
+            self._persons.append(True)
+
+        self._offsets.append(len(self._names))
+
+    def __eq__(self, other) -> bool:
+        if not hasattr(other, 'entries'):
+            return NotImplemented
+
+        return (list(self.entries.keys()) == list(other.entries.keys())
+                and all(e == other.entries[k]
+                        for k, e in self.entries.items()))
+
+# -----------------------------------------------------------------------------
+
+class EntriesView(Mapping):
+    """A read-only mapping of citation keys to the entries of a CompactData
+    object; keys are case-insensitive, as in pybtex.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: CompactData):
+        self._data = data
+
+    def __getitem__(self, key: str) -> 'CompactEntry':
+        return CompactEntry(self._data, self._data._lookup[key.lower()])
+
+    def __contains__(self, key) -> bool:
+        return key.lower() in self._data._lookup
+
+    def __iter__(self):
+        return iter(self._data._keys)
+
+    def __len__(self) -> int:
+        return len(self._data._keys)
+
+
+class CompactEntry:
+    """A read-only view of a single entry of a CompactData object, providing
+    the attributes of a pybtex Entry that are used for reading.
+
+    Person fields are parsed into Person objects on each access of persons.
+    """
+    __slots__ = ('_data', '_idx')
+
+    def __init__(self, data: CompactData, idx: int):
+        self._data = data
+        self._idx = idx
+
+    @property
+    def key(self) -> str:
+        """The citation key of this entry"""
+        return self._data._keys[self._idx]
+
+    @property
+    def original_type(self) -> str:
+        """The type of this entry, as written in the file"""
+        return self._data.strings[self._data._types[self._idx]]
+
+    @property
+    def type(self) -> str:
+        """The lower-case type of this entry, e.g. 'article'"""
+        return self.original_type.lower()
+
+    @property
+    def fields(self) -> 'FieldsView':
+        """A read-only mapping of the fields of this entry"""
+        return FieldsView(self._data, self._idx)
+
+    @property
+    def persons(self) -> OrderedCaseInsensitiveDict:
+        """The persons of this entry by their roles; parsed on access"""
+        persons = OrderedCaseInsensitiveDict()
+
+        for role, names in _iter_fields(self._data, self._idx, persons=True):
+            persons[role] = [Person(name) for name in split_name_list(names)]
+
+        return persons
+
+    def person_roles(self) -> list:
+        """Returns the roles of the persons of this entry, without parsing
+        the person fields"""
+        return [role for role, _
+                in _iter_fields(self._data, self._idx, persons=True)]
+
+    def person_names(self, role: str) -> list:
+        """Returns the names of the persons with the given role as strings,
+        without parsing them into Person objects"""
+        for name, names in _iter_fields(self._data, self._idx, persons=True):
+            if name.lower() == role.lower():
+                return split_name_list(names)
+
+        return []
+
+    def __eq__(self, other) -> bool:
+        try:
+            return (self.type == other.type
+                    and list(self.fields.items()) == list(other.fields.items())
+                    and self.persons == other.persons)
+
+        except AttributeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return "CompactEntry({!r}, key={!r}, fields={!r})".format(
+            self.original_type, self.key, list(self.fields.items()))
+
+
+class FieldsView(Mapping):
+    """A read-only mapping of the (non-person) fields of a single entry of a
+    CompactData object; field names are case-insensitive, as in pybtex.
+    """
+    __slots__ = ('_data', '_idx')
+
+    def __init__(self, data: CompactData, idx: int):
+        self._data = data
+        self._idx = idx
+
+    def __getitem__(self, name: str) -> str:
+        name = name.lower()
+
+        for field, value in _iter_fields(self._data, self._idx):
+            if field.lower() == name:
+                return value
+
+        raise KeyError(name)
+
+    def __iter__(self):
+        return (field for field, _ in _iter_fields(self._data, self._idx))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+# -----------------------------------------------------------------------------
+
+def intern_entry(strings: StringTable, entry, fields=(), persons=(),
+                 separators: dict=None, replace: bool=False) -> dict:
+    """Interns the values of the given fields and person roles of an entry.
+
+    Args:
+        strings (StringTable): The table to intern the values in
+        entry: The entry, e.g. a pybtex Entry or a CompactEntry
+        fields (Iterable[str], optional): The fields to intern the values of
+        persons (Iterable[str], optional): The person roles to intern the
+            names of, e.g. 'author'
+        separators (dict, optional): For fields holding a list of values,
+            e.g. keywords, the separator of these values by field name; each
+            value is then interned separately.
+        replace (bool, optional): Whether to replace the fields of the entry
+            by ones with interned names and values, such that equal strings
+            are held only once. Values of fields with a separator are kept,
+            as only their single values are interned. Requires the fields to
+            be mutable.
+
+    Returns:
+        dict: The ids of the interned values, as tuples by the lower-case
+            names of the fields and roles that are present in the entry
+    """
+    intern = strings.intern
+    separators = separators if separators is not None else dict()
+    ids = dict()
+
+    for name in fields:
+        value = entry.fields.get(name)
+        if value is None:
+            continue
+
+        sep = separators.get(name)
+        values = [v.strip() for v in value.split(sep)] if sep else [value]
+        ids[name.lower()] = tuple(intern(v) for v in values if v)
+
+    for role in persons:
+        names = (entry.person_names(role) if hasattr(entry, 'person_names')
+                 else [str(person) for person in entry.persons.get(role, [])])
+        if names:
+            ids[role.lower()] = tuple(intern(name) for name in names)
+
+    if replace:
+        interned = set(f.lower() for f in fields if f not in separators)
+        entry.fields = OrderedCaseInsensitiveDict(
+            (strings[intern(name)],
+             strings[intern(value)] if name.lower() in interned else value)
+            for name, value in entry.fields.items())
+
+    return ids
+
+def _iter_fields(data: CompactData, idx: int, persons: bool=False):
+    """Iterates over the (name, value) pairs of either the fields or the
+    person fields of the entry with the given index"""
+    strings = data.strings
+
+    for i in range(data._offsets[idx], data._offsets[idx + 1]):
+        if data._persons[i] == persons:
+            yield strings[data._names[i]], strings[data._values[i]]
@@ -1,24 +1,226 @@
 """Collection of tool functions"""
 
-from pkg_resources import resource_filename
-
-import yaml
+import json
+import os
+from collections.abc import Mapping
 
 # Local constants
-CFG_PATH = resource_filename('citationweb', 'cfg.yml')
+# The config file, which is installed as package data next to this module
+CFG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'cfg.yml')
+
+# The user config, whose entries recursively update the config, if it exists
+USER_CFG_PATH = os.path.expanduser('~/.config/citationweb/cfg.yml')
+
+# The precompiled snapshot of the config, written by compile_cfg on install
+SNAPSHOT_PATH = os.path.join(os.path.dirname(CFG_PATH), 'cfg.json')
+
+# The configuration, loaded once per process
+_cfg = None
 
 # -----------------------------------------------------------------------------
 
-def load_cfg(modstr: str=None) -> dict:
-    """Loads the config file for the citationweb package"""
-    with open(CFG_PATH) as cfg_file:
-        cfg = yaml.load(cfg_file.read())
+class CfgView(Mapping):
+    """A read-only view of a section of the configuration.
+
+    The view refers to the section by its path rather than holding its
+    values; it thus reflects a reload of the configuration. Sub-sections are
+    returned as views as well, lists as tuples.
+    """
+
+    def __init__(self, path: tuple=()):
+        """Sets up the view of the section with the given path, i.e. the
+        sequence of keys leading to the section"""
+        self._path = tuple(path)
+
+    def __getitem__(self, key: str):
+        value = self._section()[key]
+
+        if isinstance(value, dict):
+            return CfgView(self._path + (key,))
+
+        elif isinstance(value, list):
+            return tuple(value)
+
+        return value
+
+    def __iter__(self):
+        return iter(self._section())
+
+    def __len__(self) -> int:
+        return len(self._section())
+
+    def __repr__(self) -> str:
+        return "CfgView({!r}, {!r})".format(self._path, dict(self._section()))
+
+    def _section(self) -> dict:
+        """Returns the viewed section of the loaded configuration"""
+        section = _get_cfg()
+        for key in self._path:
+            section = section[key]
+
+        return section
+
+# -----------------------------------------------------------------------------
+
+def load_cfg(modstr: str=None) -> CfgView:
+    """Returns a read-only view of the config of the citationweb package.
+
+    The config is read only once per process; use reload_cfg to read it
+    again. It is read from the precompiled snapshot if that is up to date,
+    and parsed from the YAML files otherwise.
+
+    Args:
+        modstr (str, optional): The name of a module, e.g. __name__, to only
+            return the section of the config for that module
+
+    Returns:
+        CfgView: The view of the config or of the section
+    """
+    if not modstr:
+        return CfgView()
+
+    # From the modstr, get the module
+    module = ".".join(modstr.split(".")[1:])
+
+    # Check that the section exists; accessing it later would fail otherwise
+    _get_cfg()[module]
+
+    return CfgView((module,))
+
+def reload_cfg():
+    """Reads the config again; all views of the config reflect the new
+    values. Values that modules have already used at import time, e.g. for
+    module constants, are not updated."""
+    global _cfg
+    _cfg = _read_cfg()
+
+def compile_cfg(path: str=None) -> str:
+    """Parses the config, including the user config, and stores it as a
+    JSON snapshot, which is faster to load than the YAML files.
+
+    The snapshot holds the digests of the YAML files it was compiled from;
+    it is only used as long as these files, including the presence or
+    absence of the user config, are unchanged. Their modification times
+    are not relied on, as copying or checking out the files changes them.
+
+    Args:
+        path (str, optional): Where to store the snapshot; defaults to
+            SNAPSHOT_PATH, next to the config file.
 
-    if modstr:
-        # From the modstr, get the module
-        module = ".".join(modstr.split(".")[1:])
+    Returns:
+        str: The path the snapshot was stored at
 
-        # Extract the config for the corresponding module
-        cfg = cfg[module]
+    Raises:
+        ValueError: If the config cannot be represented as JSON
+    """
+    path = path if path else SNAPSHOT_PATH
+    snapshot = dict(sources=_source_digests(), cfg=_parse_cfg())
+
+    content = json.dumps(snapshot)
+    if json.loads(content) != snapshot:
+        raise ValueError("The config cannot be stored as a JSON snapshot, as "
+                         "it holds values or keys that JSON does not "
+                         "support!")
+
+    # Write atomically, such that a snapshot is either complete or missing;
+    # tempfile is only needed here and slow to import
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+
+        # Readable like the config file, not only by the owner
+        os.chmod(tmp_path, os.stat(CFG_PATH).st_mode & 0o666)
+        os.replace(tmp_path, path)
+
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return path
+
+# -----------------------------------------------------------------------------
+
+def _get_cfg() -> dict:
+    """Returns the loaded config, loading it if this did not happen yet"""
+    global _cfg
+
+    if _cfg is None:
+        _cfg = _read_cfg()
+
+    return _cfg
+
+def _read_cfg() -> dict:
+    """Reads the config from the snapshot or, if that is missing or out of
+    date, from the YAML files"""
+    cfg = _load_snapshot()
+    return cfg if cfg is not None else _parse_cfg()
+
+def _load_snapshot() -> dict:
+    """Loads the config from the snapshot; returns None if there is no
+    snapshot or it is out of date"""
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            snapshot = json.load(f)
+
+        digests = _source_digests()
+
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get('sources') != digests:
+        # Compiled from files that changed since, or with a user config that
+        # no longer exists, or without one
+        return None
+
+    return snapshot.get('cfg')
+
+def _source_digests() -> dict:
+    """Returns the SHA-1 digests of the config file and of the user config,
+    the latter being None if there is no user config"""
+    import hashlib
+    digests = dict()
+
+    for name, path in (('cfg', CFG_PATH), ('user_cfg', _user_cfg_path())):
+        if path is None:
+            digests[name] = None
+            continue
+
+        with open(path, 'rb') as f:
+            digests[name] = hashlib.sha1(f.read()).hexdigest()
+
+    return digests
+
+def _parse_cfg() -> dict:
+    """Parses the config file and updates it with the user config, using
+    the C implementation of the YAML loader if available"""
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    with open(CFG_PATH) as cfg_file:
+        cfg = yaml.load(cfg_file, Loader=loader)
+
+    user_cfg = _user_cfg_path()
+    if user_cfg:
+        with open(user_cfg) as cfg_file:
+            _recursive_update(cfg, yaml.load(cfg_file, Loader=loader) or {})
 
     return cfg
+
+def _user_cfg_path() -> str:
+    """Returns the path of the user config or None, if there is none"""
+    return USER_CFG_PATH if os.path.isfile(USER_CFG_PATH) else None
+
+def _recursive_update(d: dict, u: dict):
+    """Updates the dict d with the dict u, recursing into dicts that are
+    values of both"""
+    for key, value in u.items():
+        if isinstance(value, dict) and isinstance(d.get(key), dict):
+            _recursive_update(d[key], value)
+
+        else:
+            d[key] = value
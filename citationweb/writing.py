@@ -0,0 +1,284 @@
+"""This module holds functions to write bibliography data to bibtex files.
+
+Entries are written one at a time to a buffered temporary file next to the
+target, which then atomically replaces the target. Thus, the output is never
+held in memory as a whole, and the target is either fully written or left
+unchanged.
+
+Alternatively, a file can be written by splicing changed parts into the
+content of a source file, copying the unchanged parts byte by byte; if the
+OS allows it, without copying them through user space.
+
+Files whose path or content indicates compression, e.g. .bib.gz files, are
+compressed and decompressed as streams while reading and writing.
+"""
+
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+
+from citationweb import compression, parsing
+from citationweb.parsing import open_buffer
+from citationweb.tools import load_cfg
+
+# Local constants
+cfg = load_cfg(__name__)
+
+# -----------------------------------------------------------------------------
+
+@contextmanager
+def atomic_open(path: str, mode: str='w', encoding: str=None,
+                buffering: int=None, compress: str=None):
+    """Opens a temporary file next to the given path, which replaces the
+    path once the context is left without an exception.
+
+    The temporary file is flushed and synced to disk before replacing the
+    path. If an exception occurs, it is removed and the path is untouched.
+    A symlinked path stays a symlink, as the file it points to is replaced.
+
+    Args:
+        path (str): The path to eventually write to
+        mode (str, optional): The mode to open the file with, 'w' or 'wb'
+        encoding (str, optional): The encoding, for text mode; defaults to
+            the encoding given in the configuration of the parsing module.
+        buffering (int, optional): The buffer size in bytes; defaults to the
+            value given in the configuration.
+        compress (str, optional): The compression of the written data; if
+            not given, it is detected from the path, see compression.detect
+
+    Yields:
+        The opened temporary file or, for compressed files, a stream that
+            compresses the data written to it
+    """
+    path = os.path.realpath(path)
+    dirname, basename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=basename,
+                                    suffix='.tmp')
+
+    if 'b' not in mode:
+        encoding = encoding if encoding else parsing.cfg['encoding']
+
+    buffering = buffering if buffering else cfg['buffer_size']
+    compress = compress if compress else compression.detect(path, mode='w')
+
+    try:
+        with os.fdopen(fd, 'wb', buffering=buffering) as raw:
+            f = raw
+            if compress:
+                f = compression.compressing_writer(raw, compress)
+
+            if 'b' not in mode:
+                f = io.TextIOWrapper(f, encoding=encoding, newline='')
+
+            yield f
+
+            # Finish the wrappers without closing the temporary file
+            if 'b' not in mode:
+                f = f.detach()
+
+            if compress:
+                f.close()
+
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        # Keep the permissions of the file that is replaced; new files get
+        # the default permissions instead of those of temporary files
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+
+        os.replace(tmp_path, path)
+
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def format_entry(key: str, entry, sort_fields: bool=False,
+                 indent: str=None) -> str:
+    """Formats a single entry as bibtex, writing all values in braces.
+
+    Args:
+        key (str): The citation key of the entry
+        entry: The entry, e.g. a pybtex Entry or a CompactEntry
+        sort_fields (bool, optional): Whether to sort the fields, including
+            person fields, by name, as BibDesk does. Otherwise, the person
+            fields come first.
+        indent (str, optional): The indentation of the fields; defaults to
+            the value given in the configuration. Creators have their own,
+            e.g. BibDesk indents with a tab.
+
+    Returns:
+        str: The formatted entry, ending with a newline
+    """
+    indent = indent if indent is not None else cfg['indent']
+
+    if hasattr(entry, 'person_roles'):
+        # Avoid parsing raw person fields
+        persons = [(role, " and ".join(entry.person_names(role)))
+                   for role in entry.person_roles()]
+
+    else:
+        persons = [(role, " and ".join(str(person) for person in people))
+                   for role, people in entry.persons.items()]
+
+    fields = persons + list(entry.fields.items())
+
+    if sort_fields:
+        fields.sort(key=lambda field: field[0].lower())
+
+    lines = ["@{}{{{},".format(entry.original_type, key)]
+    lines += ["{}{} = {{{}}},".format(indent, name, value)
+              for name, value in fields]
+
+    if fields:
+        # No comma after the last field
+        lines[-1] = lines[-1][:-1]
+
+    lines.append("}\n")
+    return "\n".join(lines)
+
+def write_bibfile(path: str, entries, preamble: str=None, appdx: str=None,
+                  sort_fields: bool=False, indent: str=None,
+                  encoding: str=None):
+    """Writes entries to a bibtex file, streaming and atomically.
+
+    Args:
+        path (str): The file to write to; it is replaced only after all
+            data was written successfully
+        entries: A mapping of citation keys to entries, e.g. the entries of
+            a BibliographyData
+        preamble (str, optional): The preamble to write before the entries
+        appdx (str, optional): The appendix to write after the entries, e.g.
+            the @comment blocks BibDesk stores its groups in
+        sort_fields (bool, optional): Whether to sort the fields by name
+        indent (str, optional): The indentation of the fields; defaults to
+            the value given in the configuration.
+        encoding (str, optional): The encoding of the file; defaults to the
+            encoding given in the configuration of the parsing module.
+    """
+    with atomic_open(path, encoding=encoding) as f:
+        if preamble:
+            f.write("@preamble{{{{{}}}}}\n\n".format(preamble))
+
+        for key, entry in entries.items():
+            f.write(format_entry(key, entry, sort_fields=sort_fields,
+                                 indent=indent))
+            f.write("\n")
+
+        if appdx:
+            f.write(appdx)
+
+def splice_file(path: str, source: str, edits, encoding: str=None):
+    """Writes the content of a source file to a path, with byte ranges of
+    the content replaced by the given texts. All other parts of the source
+    file are copied verbatim.
+
+    The file is written atomically; the path may be the source file itself.
+
+    Args:
+        path (str): The file to write to
+        source (str): The file to copy from
+        edits (Iterable[tuple]): The edits, as (start, end, text) tuples that
+            are sorted by start and do not overlap. The byte range [start,
+            end) of the source file is replaced by the text, which is
+            inserted if start and end are equal. For compressed source
+            files, the ranges refer to the decompressed content.
+        encoding (str, optional): The encoding of the texts; defaults to the
+            encoding given in the configuration of the parsing module.
+    """
+    encoding = encoding if encoding else parsing.cfg['encoding']
+
+    if compression.detect(source) or compression.detect(path, mode='w'):
+        # Byte ranges cannot be copied from or to compressed data; stream
+        # the decompressed content through a buffer instead
+        with open_buffer(source) as buf, atomic_open(path, mode='wb') as f:
+            pos = 0
+
+            for start, end, text in edits:
+                f.write(buf[pos:start])
+                if text:
+                    f.write(text.encode(encoding))
+
+                pos = end
+
+            f.write(buf[pos:])
+
+        return
+
+    with open(source, 'rb') as src, atomic_open(path, mode='wb') as f:
+        pos = 0
+
+        for start, end, text in edits:
+            if start > pos:
+                f.flush()
+                copy_range(src.fileno(), f.fileno(), pos, start - pos)
+
+            if text:
+                f.write(text.encode(encoding))
+
+            pos = end
+
+        size = os.fstat(src.fileno()).st_size
+        if size > pos:
+            f.flush()
+            copy_range(src.fileno(), f.fileno(), pos, size - pos)
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int):
+    """Copies a byte range of one file to the current position of another.
+
+    Uses copy_file_range or sendfile where available, which copy within the
+    kernel; otherwise, or if these fail, e.g. across file systems, the bytes
+    are copied through a buffer.
+
+    Args:
+        src_fd (int): The file descriptor to copy from
+        dst_fd (int): The file descriptor to copy to
+        offset (int): The start of the range in the source file
+        count (int): The number of bytes to copy
+
+    Raises:
+        EOFError: If the source file ends before the end of the range
+    """
+    zero_copy = True
+
+    while count > 0:
+        if zero_copy:
+            try:
+                copied = _zero_copy(src_fd, dst_fd, offset, count)
+
+            except (AttributeError, OSError):
+                # Not supported here; copy through a buffer instead
+                zero_copy = False
+                continue
+
+        else:
+            os.lseek(src_fd, offset, os.SEEK_SET)
+            chunk = os.read(src_fd, min(count, cfg['buffer_size']))
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(dst_fd, view):]
+
+            copied = len(chunk)
+
+        if not copied:
+            raise EOFError("Source file ended {} bytes before the end of the "
+                           "range to copy!".format(count))
+
+        offset += copied
+        count -= copied
+
+# -----------------------------------------------------------------------------
+
+def _zero_copy(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    """Copies bytes between files within the kernel; returns the number of
+    bytes copied"""
+    if hasattr(os, 'copy_file_range'):
+        return os.copy_file_range(src_fd, dst_fd, count, offset_src=offset)
+
+    return os.sendfile(dst_fd, src_fd, offset, count)
@@ -1,11 +1,39 @@
 #!/usr/bin/env python3
 """Set up the citationweb"""
 
+import os
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
 
 INSTALL_DEPS = ["PyYAML>=3.12", "pypdf2>=1.26", "pybtex>=0.21"]
 TEST_DEPS    = ["pytest>=3.4.0", "pytest-cov>=2.5.1"]
 
+
+class BuildPyWithCfgSnapshot(build_py):
+    """Builds the package and compiles its config into a snapshot, which is
+    faster to load than the YAML config file"""
+
+    def run(self):
+        super().run()
+
+        if self.dry_run:
+            return
+
+        try:
+            from citationweb.tools import compile_cfg
+            path = compile_cfg(os.path.join(self.build_lib, "citationweb",
+                                            "cfg.json"))
+
+        except (ImportError, ValueError) as err:
+            # Without a snapshot, the config is parsed at runtime instead
+            self.warn("Could not compile the config snapshot: {}".format(err))
+
+        else:
+            self.announce("compiled config snapshot to {}".format(path),
+                          level=2)
+
+
 setup(name="citationweb",
       version="1.0-alpha",
       description="Processes BibTex files and creates a network of citations",
@@ -13,11 +41,13 @@ setup(name="citationweb",
       author="Yunus Sevinchan",
       author_email="blsqr0@gmail.com",
       license="", # TODO
+      python_requires=">=3.7",
       packages=["citationweb"],
       package_data=dict(citationweb=["*.yml"]),
       install_requires=INSTALL_DEPS,
       tests_require=TEST_DEPS,
       test_suite="pytest",
       extras_require=dict(test_deps=TEST_DEPS),
-      scripts=["cli/cweb"]
+      scripts=["cli/cweb"],
+      cmdclass=dict(build_py=BuildPyWithCfgSnapshot)
       )
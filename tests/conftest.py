@@ -0,0 +1,50 @@
+"""Fixtures shared by all tests"""
+
+from shutil import copyfile
+from pkg_resources import resource_filename
+
+import pytest
+
+import citationweb.cache
+
+# Fixtures --------------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmpdir, monkeypatch) -> str:
+    """Redirects the persistent cache to a temporary directory"""
+    path = str(tmpdir.join("cache"))
+    monkeypatch.setattr(citationweb.cache, 'CACHE_DIR', path)
+    return path
+
+@pytest.fixture
+def bib_minimal(tmpdir) -> str:
+    """Returns the path to a minimal bibliography file that is copied to a
+    temporary directory."""
+    src = resource_filename("tests", "libs/minimal.bib")
+    dst = str(tmpdir.join("tmp.bib"))
+
+    # Copy the file to the temporary directory and return the path
+    copyfile(src, dst)
+    return dst
+
+@pytest.fixture
+def bib_bibdesk(tmpdir) -> str:
+    """Returns the path to a BibDesk bibliography file that is copied to a
+    temporary directory."""
+    src = resource_filename("tests", "libs/bibdesk.bib")
+    dst = str(tmpdir.join("tmp.bib"))
+
+    # Copy the file to the temporary directory and return the path
+    copyfile(src, dst)
+    return dst
+
+@pytest.fixture
+def bib_macros(tmpdir) -> str:
+    """Returns the path to a bibliography file with macros that is copied to
+    a temporary directory."""
+    src = resource_filename("tests", "libs/macros.bib")
+    dst = str(tmpdir.join("tmp.bib"))
+
+    # Copy the file to the temporary directory and return the path
+    copyfile(src, dst)
+    return dst
@@ -0,0 +1,55 @@
+"""Test the appendix module"""
+
+from pkg_resources import resource_filename
+
+from citationweb.appendix import Appendix, CommentBlock, comment_kind
+from citationweb.index import EntryIndex
+
+# Fixtures --------------------------------------------------------------------
+
+BIBDESK = resource_filename("tests", "libs/bibdesk.bib")
+
+# Tests -----------------------------------------------------------------------
+
+def test_comment_kind():
+    """Test determining the kind of comment blocks"""
+    assert comment_kind(b'@comment{BibDesk Static Groups{\n}}'
+                        ) == 'static_groups'
+    assert comment_kind(b'@Comment{BibDesk Smart Groups{}}') == 'smart_groups'
+    assert comment_kind(b'@comment{jabref-meta: databaseType:bibtex;}'
+                        ) == 'jabref_meta'
+    assert comment_kind(b'@comment( jabref-meta: grouping:)') == 'jabref_meta'
+    assert comment_kind(b'@comment{Some note}') == 'comment'
+
+def test_appendix(tmpdir):
+    """Test the Appendix class"""
+    path = str(tmpdir.join("tmp.bib"))
+    with open(BIBDESK, 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read() + b'\n@comment{jabref-meta: databaseType:bibtex;}'
+                  + b'\n@comment{Note}\n')
+
+    appdx = Appendix(path, EntryIndex(path, persist=False).comments)
+
+    assert len(appdx) == 4
+    assert appdx.kinds == ('static_groups', 'smart_groups', 'jabref_meta',
+                           'comment')
+    assert all(isinstance(block, CommentBlock) for block in appdx)
+
+    # Blocks are read from their byte range only
+    block = appdx.find('smart_groups')
+    assert appdx[1] == block
+    assert appdx.read(block).startswith('@comment{BibDesk Smart Groups{')
+    assert appdx.read(block).endswith('</plist>\n}}')
+    assert appdx.get('jabref_meta') == (
+        '@comment{jabref-meta: databaseType:bibtex;}')
+    assert appdx.find_all('comment') == [appdx[3]]
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    assert appdx.read(block, buf=content) == appdx.read(block)
+
+    # Missing kinds
+    assert appdx.find('url_groups') is None
+    assert appdx.get('url_groups') is None
+    assert appdx.find_all('url_groups') == []
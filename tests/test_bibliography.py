@@ -1,35 +1,20 @@
 """Test the Bibliography class"""
 
-from shutil import copyfile
+import base64
+import gzip
+import lzma
+import os
+import plistlib
 from pkg_resources import resource_filename
 
 import pytest
+from pybtex.database import Entry
 
+from citationweb import bibliography, cache
 from citationweb.bibliography import Bibliography
-
-# Fixtures --------------------------------------------------------------------
-
-@pytest.fixture
-def bib_minimal(tmpdir) -> str:
-    """Returns the path to a minimal bibliography file that is copied to a
-    temporary directory."""
-    src = resource_filename("tests", "libs/minimal.bib")
-    dst = str(tmpdir.join("tmp.bib"))
-
-    # Copy the file to the temporary directory and return the path
-    copyfile(src, dst)
-    return dst
-
-@pytest.fixture
-def bib_bibdesk(tmpdir) -> str:
-    """Returns the path to a BibDesk bibliography file that is copied to a
-    temporary directory."""
-    src = resource_filename("tests", "libs/bibdesk.bib")
-    dst = str(tmpdir.join("tmp.bib"))
-
-    # Copy the file to the temporary directory and return the path
-    copyfile(src, dst)
-    return dst
+from citationweb.entries import LazyEntry
+from citationweb.index import EntryIndex
+from citationweb.store import CompactData
 
 # Tests -----------------------------------------------------------------------
 
@@ -59,3 +44,606 @@ def test_init_bibdesk(bib_bibdesk):
     assert bd_bib.data
     assert bd_bib.appdx
     assert bd_bib.appdx.startswith('@comment{BibDesk')
+
+def test_detect_creator(bib_bibdesk, tmpdir, monkeypatch):
+    """Tests detecting the creator from the start and end of the file"""
+    bib = Bibliography(bib_bibdesk, creator='auto')
+    assert bib.creator == 'BibDesk'
+    assert bib.appdx.startswith('@comment{BibDesk')
+
+    minimal = resource_filename("tests", "libs/minimal.bib")
+    assert Bibliography(minimal, creator='auto', lazy=True).creator is None
+
+    # JabRef files are marked at their start and end
+    path = str(tmpdir.join("jabref.bib"))
+    with open(path, 'w') as f:
+        f.write("% Encoding: UTF-8\n\n"
+                "@Article{Eigen1971,\n  year = {1971},\n}\n\n"
+                "@Comment{jabref-meta: databaseType:bibtex;}\n")
+
+    bib = Bibliography(path, creator='auto')
+    assert bib.creator == 'JabRef'
+    assert bib.appdx == "@Comment{jabref-meta: databaseType:bibtex;}\n"
+
+    # Only the start and the end of the file are searched
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content + "\n@misc{foo,\n  note = {" + 64 * "x" + "}\n}\n")
+
+    monkeypatch.setattr(bibliography, 'cfg',
+                        dict(bibliography.cfg, detect_creator=dict(size=64)))
+    assert Bibliography(bib_bibdesk, creator='auto').creator is None
+
+def test_iter_entries(bib_bibdesk):
+    """Tests iterating over the entries without loading the whole file"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+
+    entries = list(bib.iter_entries())
+    assert [k for k, _ in entries] == ['Eigen1971']
+    assert entries == list(bib.data.entries.items())
+
+def test_init_parallel(bib_bibdesk):
+    """Tests initialisation with parsing in multiple processes"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk', workers=2)
+
+    assert bib.data == Bibliography(bib_bibdesk).data
+    assert bib.appdx.startswith('@comment{BibDesk')
+
+def test_cache(bib_minimal, cache_dir):
+    """Tests that parsed data is cached and reused"""
+    bib = Bibliography(bib_minimal, use_cache=False)
+    assert not os.path.exists(cache_dir)
+
+    bib = Bibliography(bib_minimal)
+    assert cache.load(bib_minimal)[0] == bib.data
+
+    # Loading again uses the cached data
+    assert Bibliography(bib_minimal).data == bib.data
+
+    # The cache can be invalidated explicitly
+    bib.invalidate_cache()
+    assert cache.load(bib_minimal) is None
+
+def test_get_entry(bib_bibdesk):
+    """Tests parsing single entries via the index"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+
+    assert bib.get_entry('Eigen1971') == bib.data.entries['Eigen1971']
+
+    with pytest.raises(KeyError):
+        bib.get_entry('foo')
+
+def test_reload(bib_bibdesk):
+    """Tests reloading only the entries that changed"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+
+    # The index of the loaded state is recorded while parsing, or restored
+    # from the cache, such that only changed entries need to be parsed
+    assert bib._snapshot is not None
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+    assert bib._snapshot is not None
+
+    # Nothing changed
+    assert bib.reload() == ([], [], [])
+
+    # Change, add and remove entries
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    content = content.replace("Year = {1971}", "Year = {1972}")
+    new_entry = "@misc{Foo,\n    Title = {Bar}\n}\n\n"
+    content = content.replace("@comment", new_entry + "@comment", 1)
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content)
+
+    changes = bib.reload()
+    assert changes.added == ['Foo']
+    assert changes.changed == ['Eigen1971']
+    assert changes.removed == []
+    assert bib.data == Bibliography(bib_bibdesk, use_cache=False).data
+    assert bib.data.entries['Eigen1971'].fields['Year'] == "1972"
+    assert bib.appdx.startswith('@comment{BibDesk')
+
+    content = content.replace(new_entry, "")
+    with open(bib_bibdesk, 'w') as f:
+        f.write("@string{foo = {bar}}\n" + content)
+
+    changes = bib.reload()
+    assert changes == ([], [], ['Foo'])
+    assert list(bib.data.entries.keys()) == ['Eigen1971']
+
+    # Unsaved modifications are not cached as the content of the file
+    bib.data.entries['Eigen1971'].fields['Title'] = "Unsaved"
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write("@string{foo = {bar}}\n"
+                + content.replace("@comment", new_entry + "@comment", 1))
+
+    assert bib.reload().added == ['Foo']
+    assert bib.data.entries['Eigen1971'].fields['Title'] == "Unsaved"
+
+    fresh = Bibliography(bib_bibdesk).data.entries['Eigen1971']
+    assert fresh.fields['Title'] != "Unsaved"
+
+    # They are kept as well if all entries are re-parsed, as a macro changed
+    with open(bib_bibdesk, 'w') as f:
+        f.write("@string{foo = {baz}}\n"
+                + content.replace("@comment", new_entry.replace("Bar", "Baz")
+                                  + "@comment", 1))
+
+    assert bib.reload() == ([], ['Foo'], [])
+    assert bib.data.entries['Eigen1971'].fields['Title'] == "Unsaved"
+    assert bib.data.entries['Foo'].fields['Title'] == "Baz"
+    assert bib.journal.dirty == ['Eigen1971']
+
+    # Unless the file changed them, too
+    with open(bib_bibdesk, 'w') as f:
+        f.write("@string{foo = {qux}}\n"
+                + content.replace("Year = {1972}", "Year = {1973}"))
+
+    assert bib.reload() == ([], ['Eigen1971'], ['Foo'])
+    assert bib.data.entries['Eigen1971'].fields['Title'] != "Unsaved"
+    assert bib.data.entries['Eigen1971'].fields['Year'] == "1973"
+    assert bib.journal.dirty == []
+
+def test_lazy(bib_bibdesk):
+    """Tests deferring the loading until first access"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk', lazy=True)
+    assert bib._data is None
+    assert bib._appdx is None
+
+    # The appendix is loaded independently of the data
+    assert bib.appdx.startswith('@comment{BibDesk')
+    assert bib._data is None
+
+    assert bib.data == Bibliography(bib_bibdesk).data
+
+    # Reloading before the data was loaded does not load it
+    bib = Bibliography(bib_bibdesk, lazy=True)
+    assert bib.reload() == ([], [], [])
+    assert bib._data is None
+    assert bib.appdx is None
+
+def test_lazy_fields(bib_bibdesk):
+    """Tests loading with lazy processing of the fields"""
+    bib = Bibliography(bib_bibdesk, lazy_fields=True)
+    entry = bib.data.entries['Eigen1971']
+
+    assert isinstance(entry, LazyEntry)
+    assert entry._raw_persons
+    assert entry == Bibliography(bib_bibdesk).data.entries['Eigen1971']
+    assert entry.decoded('Title').startswith("Selforganization")
+
+    # Cached separately from eagerly processed data
+    assert isinstance(Bibliography(bib_bibdesk, lazy_fields=True)
+                      .data.entries['Eigen1971'], LazyEntry)
+    assert not isinstance(Bibliography(bib_bibdesk)
+                          .data.entries['Eigen1971'], LazyEntry)
+
+    # Single entries are parsed with the same options
+    assert isinstance(bib.get_entry('Eigen1971'), LazyEntry)
+    assert all(isinstance(e, LazyEntry) for _, e in bib.iter_entries())
+
+def test_fields_where(bib_bibdesk):
+    """Tests keeping only some fields and entries while parsing"""
+    bib = Bibliography(bib_bibdesk, fields=['doi', 'Title'])
+    entry = bib.data.entries['Eigen1971']
+
+    assert list(entry.fields.keys()) == ['Doi', 'Title']
+    assert not entry.persons
+
+    # Persons are kept when requested, also lazily
+    bib = Bibliography(bib_bibdesk, fields=['author'], lazy_fields=True)
+    assert not bib.data.entries['Eigen1971'].fields
+    assert bib.data.entries['Eigen1971'].persons['author']
+
+    # Data with different fields is cached separately
+    assert Bibliography(bib_bibdesk).data.entries['Eigen1971'].fields['Year']
+
+    # Entries can be dropped via a predicate
+    bib = Bibliography(bib_bibdesk, where=lambda e: e.type == 'book')
+    assert not bib.data.entries
+
+    with pytest.raises(KeyError):
+        bib.get_entry('Eigen1971')
+
+    bib = Bibliography(bib_bibdesk,
+                       where=lambda e: int(e.fields['year']) < 1980)
+    assert list(bib.data.entries.keys()) == ['Eigen1971']
+
+    # Reloading applies the predicate as well
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("Year = {1971}", "Year = {1990}"))
+
+    assert bib.reload().changed == ['Eigen1971']
+    assert not bib.data.entries
+
+def test_fast_parser(bib_bibdesk):
+    """Tests loading with the fast tokenizer"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk', parser='fast',
+                       use_cache=False)
+    assert bib._parser_kwargs()['fast']
+    assert bib.data == Bibliography(bib_bibdesk, use_cache=False).data
+
+    # Only used if the creator supports it
+    bib = Bibliography(bib_bibdesk, parser='fast')
+    assert not bib._parser_kwargs()['fast']
+
+    with pytest.raises(ValueError, match="Unsupported parser 'invalid'"):
+        Bibliography(bib_bibdesk, parser='invalid')
+
+def test_compact(bib_bibdesk):
+    """Tests loading into the compact entry store"""
+    bib = Bibliography(bib_bibdesk, compact=True, parser='fast',
+                       creator='BibDesk')
+
+    assert isinstance(bib.data, CompactData)
+    assert bib.data == Bibliography(bib_bibdesk).data
+    assert bib.appdx.startswith('@comment{BibDesk')
+
+    # Loaded from the cache
+    assert isinstance(Bibliography(bib_bibdesk, compact=True).data,
+                      CompactData)
+
+    # Reloading re-parses all entries
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("Year = {1971}", "Year = {1972}"))
+
+    assert bib.reload() == ([], ['Eigen1971'], [])
+    assert bib.data.entries['Eigen1971'].fields['Year'] == "1972"
+
+def test_interning(bib_bibdesk, monkeypatch):
+    """Tests the interning of values"""
+    for compact in (False, True):
+        bib = Bibliography(bib_bibdesk, compact=compact)
+        assert bib._ids is None
+
+        assert [bib.strings[i] for i in bib.get_ids('eigen1971', 'Keywords')
+                ] == ["Evolution", "Self-Organisation"]
+        assert [bib.strings[i] for i in bib.get_ids('Eigen1971', 'author')
+                ] == ["Eigen, Manfred"]
+        assert bib.get_ids('Eigen1971', 'title') == ()
+
+        with pytest.raises(KeyError):
+            bib.get_ids('foo', 'author')
+
+    # Reloading interns changed entries
+    bib = Bibliography(bib_bibdesk)
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("Journal = {Naturwissenschaften}",
+                                "Journal = {Nature}"))
+
+    bib.strings
+    assert bib.reload().changed == ['Eigen1971']
+    assert bib.strings[bib.get_ids('Eigen1971', 'journal')[0]] == "Nature"
+
+    # ... as does modifying, adding and removing them
+    entries = bib.data.entries
+    entries['Eigen1971'].fields['Journal'] = "Naturwissenschaften"
+    assert bib.strings[bib.get_ids('Eigen1971', 'journal')[0]
+                       ] == "Naturwissenschaften"
+
+    entries['Eigen1972'] = Entry('article', fields=dict(Journal="Nature"))
+    assert bib.strings[bib.get_ids('Eigen1972', 'journal')[0]] == "Nature"
+
+    del entries['Eigen1972']
+    with pytest.raises(KeyError):
+        bib.get_ids('Eigen1972', 'journal')
+
+    # Values can be interned when loading, such that entries share them
+    monkeypatch.setattr(bibliography, 'cfg', dict(
+        bibliography.cfg, interning=dict(bibliography.cfg['interning'],
+                                         share_values=True)))
+    bib = Bibliography(resource_filename("tests", "libs/macros.bib"))
+    assert bib._ids is not None
+
+    eigen1971, eigen1977 = list(bib.data.entries.values())[:2]
+    assert eigen1971.fields['Journal'] is eigen1977.fields['Journal']
+    assert bib.journal.dirty == []
+
+    # The fields of re-interned entries are still tracked
+    eigen1971.fields['Journal'] = "Nature"
+    assert bib.get_ids('Eigen1971', 'journal')
+    eigen1971 = bib.data.entries['Eigen1971']
+    eigen1971.fields['Year'] = "1972"
+    assert bib.journal.changes(key='Eigen1971')[-1].field == 'Year'
+
+def test_groups(bib_bibdesk):
+    """Tests the static groups view"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+
+    assert bib.groups['My Test Group'] == ('Eigen1971',)
+    assert bib.groups.groups_of('Eigen1971') == ('My Test Group',)
+
+    # Memoised as long as the appendix does not change
+    assert bib.groups is bib.groups
+    groups = bib.groups
+    bib.reload()
+    assert bib.groups is groups
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("My Test Group", "Renamed"))
+
+    bib.reload()
+    assert list(bib.groups) == ['Renamed']
+
+    # Without a creator, there are no groups
+    assert len(Bibliography(bib_bibdesk).groups) == 0
+
+def test_smart_groups(bib_bibdesk):
+    """Tests the smart groups view"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+
+    assert list(bib.smart_groups) == ['Evolution']
+    assert bib.smart_groups is bib.smart_groups
+    assert bib.smart_groups.evaluate(bib.data.entries) == {
+        'Evolution': ('Eigen1971',)}
+
+    # Without a creator, there are no smart groups
+    assert len(Bibliography(bib_bibdesk).smart_groups) == 0
+
+def test_resolve_files(bib_bibdesk, tmpdir):
+    """Tests resolving the linked files of the entries"""
+    blob = base64.b64encode(plistlib.dumps(dict(relativePath="Eigen.pdf"),
+                                           fmt=plistlib.FMT_BINARY))
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("Year = {1971}",
+                                "Year = {1971},\n    Bdsk-File-1 = {"
+                                + blob.decode('ascii') + "}"))
+
+    tmpdir.join("Eigen.pdf").write("")
+
+    linked = Bibliography(bib_bibdesk, creator='BibDesk').resolve_files()
+    assert linked['Eigen1971'][0].path == str(tmpdir.join("Eigen.pdf"))
+    assert linked['Eigen1971'][0].exists
+
+    # Without a creator, there are no linked files
+    assert not Bibliography(bib_bibdesk).resolve_files()
+
+def test_appendix(bib_bibdesk):
+    """Tests the structured appendix"""
+    bib = Bibliography(bib_bibdesk)
+
+    assert bib.appendix.kinds == ('static_groups', 'smart_groups')
+    assert bib.appendix.get('static_groups').startswith(
+        '@comment{BibDesk Static Groups{')
+
+def test_save(bib_bibdesk, tmpdir):
+    """Tests saving the bibliography data"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+    path = str(tmpdir.join("saved.bib"))
+
+    bib.save(path)
+
+    saved = Bibliography(path, creator='BibDesk', parser='fast')
+    assert saved.data == bib.data
+    assert saved.appdx == bib.appdx
+    assert saved.groups == bib.groups
+
+    with open(path) as f:
+        assert "    Author = {Eigen, Manfred},\n    Doi = " in f.read()
+
+    # Overwrite the associated file
+    bib.data.entries['Eigen1971'].fields['Year'] = "1972"
+    bib.save()
+
+    # ... indenting the written fields like the creator
+    with open(bib_bibdesk) as f:
+        assert "\tAuthor = {Eigen, Manfred},\n\tDoi = " in f.read()
+
+    assert bib.reload() == ([], [], [])
+    assert Bibliography(bib_bibdesk).data == bib.data
+
+    # Data with only some of the fields or entries cannot be saved
+    for kwargs in (dict(fields=['doi']), dict(where=lambda e: True)):
+        partial = Bibliography(bib_bibdesk, creator='BibDesk', **kwargs)
+        partial.data.entries['Eigen1971'].fields['Doi'] = "foo"
+
+        with pytest.raises(ValueError, match="Cannot save data"):
+            partial.save()
+
+    assert Bibliography(bib_bibdesk).data == bib.data
+
+    # Lazily loaded and compact data can be saved, too
+    Bibliography(bib_bibdesk, creator='BibDesk', lazy=True).save(path)
+    Bibliography(bib_bibdesk, creator='BibDesk', compact=True).save(path)
+    assert Bibliography(path, creator='BibDesk').data == bib.data
+
+def test_save_preserving(bib_bibdesk, tmpdir):
+    """Tests that saving copies unmodified parts of the file verbatim"""
+    path = str(tmpdir.join("saved.bib"))
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    entry = ("@book{Kauffman1993,\n\tTitle = {The Origins of Order},"
+             "\n\tYear = 1993}")
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("\n@comment", "\n" + entry + "\n\n@comment",
+                                1))
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    # Without modifications, the file is copied
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+    bib.save(path)
+
+    with open(path) as f:
+        assert f.read() == content
+
+    # Only modified entries are written anew
+    bib.data.entries['Eigen1971'].fields['Year'] = "1972"
+    bib.save(path)
+
+    with open(path) as f:
+        saved = f.read()
+
+    assert saved.startswith("%% A BibDesk library file to use for testing\n")
+    assert "Year = {1972}\n}\n\n" + entry in saved
+    assert saved.endswith(content[content.index(entry):])
+    assert Bibliography(path).data == bib.data
+
+    # Removed and added entries
+    del bib.data.entries['Eigen1971']
+    bib.data.entries['Added'] = Entry('misc', fields=dict(Title="New"))
+    bib.save()
+
+    with open(bib_bibdesk) as f:
+        saved = f.read()
+
+    assert "@article{Eigen1971" not in saved
+    assert entry + "\n\n@misc{Added,\n\tTitle = {New}\n}\n\n" in saved
+    assert saved.endswith(content[content.index("\n@comment"):])
+    assert Bibliography(bib_bibdesk).data == bib.data
+
+    # The index of the saved file is derived from the edits
+    assert bib._snapshot.dump() == EntryIndex(bib_bibdesk).dump()
+
+    # If the file changed since loading, it is not overwritten, not even
+    # through a symlink ...
+    with open(bib_bibdesk, 'a') as f:
+        f.write("% Changed elsewhere\n")
+
+    bib.data.entries['Added'].fields['Title'] = "Newer"
+    link = str(tmpdir.join("link.bib"))
+    os.symlink(bib_bibdesk, link)
+
+    for target in (None, link):
+        with pytest.raises(RuntimeError, match="changed since it was loaded"):
+            bib.save(target)
+
+    with open(bib_bibdesk) as f:
+        assert f.read().endswith("% Changed elsewhere\n")
+
+    # ... but can be saved elsewhere, writing all entries anew
+    bib.save(path)
+
+    with open(path) as f:
+        assert "Year = {1993}" in f.read()
+
+    assert Bibliography(path).data == bib.data
+
+    # Forcing overwrites the file
+    bib.save(link, force=True)
+
+    with open(bib_bibdesk) as f:
+        assert "Changed elsewhere" not in f.read()
+
+    assert Bibliography(bib_bibdesk).data == bib.data
+    assert bib.journal.dirty == []
+    assert os.path.islink(link)
+
+    # After reloading, the file can be saved again
+    with open(bib_bibdesk, 'a') as f:
+        f.write("% Changed elsewhere\n")
+
+    bib.reload()
+    bib.data.entries['Added'].fields['Title'] = "Newest"
+    bib.save()
+
+    with open(bib_bibdesk) as f:
+        saved = f.read()
+
+    assert "Newest" in saved and "Changed elsewhere" in saved
+
+def test_journal(bib_bibdesk, tmpdir):
+    """Tests tracking the modifications of entries"""
+    bib = Bibliography(bib_bibdesk, creator='BibDesk')
+    journal = bib.journal
+    assert journal.dirty == []
+
+    bib.data.entries['Eigen1971'].fields['Year'] = "1972"
+    assert journal.dirty == ['Eigen1971']
+    assert journal.changes()[0].field == 'Year'
+
+    # Saving to another file keeps the entries dirty
+    bib.save(str(tmpdir.join("saved.bib")))
+    assert journal.dirty == ['Eigen1971']
+
+    bib.save()
+    assert journal.dirty == []
+
+    # Changes of persons are saved only if marked
+    bib.data.entries['Eigen1971'].persons['Author'] = []
+    bib.save()
+    assert Bibliography(bib_bibdesk).data.entries['Eigen1971'].persons
+
+    bib.mark_modified('Eigen1971')
+    bib.save()
+    assert not Bibliography(bib_bibdesk).data.entries['Eigen1971'].persons
+
+    # Reloading an entry that changed in the file makes it clean
+    bib.data.entries['Eigen1971'].fields['Volume'] = "59"
+
+    with open(bib_bibdesk) as f:
+        content = f.read()
+
+    with open(bib_bibdesk, 'w') as f:
+        f.write(content.replace("Year = {1972}", "Year = {1973}"))
+
+    assert bib.reload().changed == ['Eigen1971']
+    assert journal.dirty == []
+
+    bib.data.entries['Eigen1971'].fields['Volume'] = "60"
+    assert journal.dirty == ['Eigen1971']
+
+    # Nothing is tracked in compact mode
+    assert not Bibliography(bib_bibdesk, compact=True).journal.dirty
+
+@pytest.mark.parametrize('ext, opener', [('.gz', gzip.open),
+                                         ('.xz', lzma.open)])
+def test_compressed(bib_bibdesk, tmpdir, ext, opener):
+    """Tests reading and writing compressed bibliography files"""
+    path = str(tmpdir.join("tmp.bib" + ext))
+
+    with open(bib_bibdesk, 'rb') as src, opener(path, 'wb') as dst:
+        dst.write(src.read())
+
+    bib = Bibliography(path, creator='BibDesk')
+    plain = Bibliography(bib_bibdesk, creator='BibDesk')
+    assert bib.data == plain.data
+    assert bib.appdx == plain.appdx
+    assert bib.groups == plain.groups
+    assert bib.appendix.get('static_groups')
+    assert list(bib.iter_entries()) == list(plain.iter_entries())
+
+    # Saving keeps the compression of the file
+    bib.data.entries['Eigen1971'].fields['Year'] = "1972"
+    bib.save()
+
+    with opener(path, 'rb') as f:
+        assert b"Year = {1972}" in f.read()
+
+    assert Bibliography(path).data == bib.data
+
+    # The compression is detected by content, too, and chosen by extension
+    # when saving to another file
+    renamed = str(tmpdir.join("renamed.bib"))
+    os.rename(path, renamed)
+    Bibliography(renamed, creator='BibDesk').save(bib_bibdesk + ext)
+
+    with opener(bib_bibdesk + ext, 'rb') as f:
+        assert b"Year = {1972}" in f.read()
+
+    Bibliography(renamed, creator='BibDesk').save(bib_bibdesk)
+    assert Bibliography(bib_bibdesk).data == bib.data
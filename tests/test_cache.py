@@ -0,0 +1,128 @@
+"""Test the cache module"""
+
+import gzip
+import os
+
+from citationweb import cache
+from citationweb.index import EntryIndex
+from citationweb.parsing import open_buffer
+
+# Tests -----------------------------------------------------------------------
+
+def test_store_load(bib_minimal):
+    """Test storing and loading data from the cache"""
+    assert cache.load(bib_minimal) is None
+
+    cache.store(bib_minimal, dict(foo="bar"))
+    assert cache.load(bib_minimal) == dict(foo="bar")
+
+    # Variants are distinct
+    assert cache.load(bib_minimal, variant='other') is None
+    cache.store(bib_minimal, dict(foo="baz"), variant='other')
+    assert cache.load(bib_minimal, variant='other') == dict(foo="baz")
+    assert cache.load(bib_minimal) == dict(foo="bar")
+
+def test_validation(bib_minimal):
+    """Test that changes to the file invalidate the cache"""
+    cache.store(bib_minimal, dict(foo="bar"))
+    stat = os.stat(bib_minimal)
+
+    # Change the content, but keep size and modification time
+    with open(bib_minimal, 'r+b') as f:
+        f.write(b'%X')
+    os.utime(bib_minimal, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert cache.load(bib_minimal) is None
+
+    # Corrupt cache files are a cache miss
+    cache.store(bib_minimal, dict(foo="bar"))
+    with open(cache._cache_file(bib_minimal, 'default'), 'wb') as f:
+        f.write(b'foo')
+
+    assert cache.load(bib_minimal) is None
+
+def test_buffer(bib_minimal, monkeypatch):
+    """Test computing the content hash from a buffer of the file"""
+    with open_buffer(bib_minimal) as buf:
+        cache.store(bib_minimal, dict(foo="bar"), buf=buf)
+
+    assert cache.load(bib_minimal) == dict(foo="bar")
+
+    # For compressed files, the hash refers to the decompressed content
+    with open(bib_minimal, 'rb') as f, gzip.open(bib_minimal + ".gz",
+                                                 'wb') as gz:
+        gz.write(f.read())
+
+    with open_buffer(bib_minimal + ".gz") as buf:
+        cache.store(bib_minimal + ".gz", dict(foo="baz"), buf=buf)
+
+    assert cache.load(bib_minimal + ".gz") == dict(foo="baz")
+
+    # With a buffer, the file is not read again
+    monkeypatch.setattr(cache.compression, 'open_stream', None)
+    assert cache.load(bib_minimal) is None
+
+    with open_buffer(bib_minimal) as buf:
+        assert cache.load(bib_minimal, buf=buf) == dict(foo="bar")
+
+def test_invalidate_clear(bib_minimal):
+    """Test explicit invalidation of cache files"""
+    cache.store(bib_minimal, dict(foo="bar"))
+    cache.store(bib_minimal, dict(foo="bar"), variant='other')
+    index = EntryIndex(bib_minimal, persist=True)
+    assert index.path == cache.index_file(bib_minimal)
+    assert os.path.isfile(index.path)
+
+    cache.invalidate(bib_minimal)
+    assert cache.load(bib_minimal) is None
+    assert cache.load(bib_minimal, variant='other') is None
+    assert not os.path.exists(index.path)
+
+    # Invalidating again or clearing an empty cache is fine
+    cache.invalidate(bib_minimal)
+    cache.clear()
+
+    cache.store(bib_minimal, dict(foo="bar"))
+    cache.store(bib_minimal, dict(foo="bar"), variant='other')
+    EntryIndex(bib_minimal, persist=True)
+    cache.clear()
+    assert not os.listdir(cache.CACHE_DIR)
+
+def test_max_size(bib_minimal, monkeypatch):
+    """Test that the least recently used cache files are removed"""
+    cache.store(bib_minimal, dict(foo="bar"), variant='old')
+    old_file = cache._cache_file(bib_minimal, 'old')
+    os.utime(old_file, (0, 0))
+
+    size = os.path.getsize(old_file)
+    monkeypatch.setattr(cache, 'cfg', dict(cache.cfg,
+                                             max_size=int(1.5 * size)))
+    cache.store(bib_minimal, dict(foo="baz"), variant='new')
+
+    assert not os.path.exists(old_file)
+    assert cache.load(bib_minimal, variant='new') == dict(foo="baz")
+
+    # Persisted entry indices count towards the size as well
+    monkeypatch.setattr(cache, 'cfg', dict(cache.cfg, max_size=10 * size))
+    index_file = EntryIndex(bib_minimal, persist=True).path
+    os.utime(index_file, (0, 0))
+    cache.prune(size)
+
+    assert not os.path.exists(index_file)
+    assert cache.load(bib_minimal, variant='new') == dict(foo="baz")
+
+def test_best_effort(bib_minimal, cache_dir, monkeypatch):
+    """Test that failing to write to or prune the cache is not an error"""
+    # A cache directory that cannot be created, as its parent is a file
+    monkeypatch.setattr(cache, 'CACHE_DIR', os.path.join(bib_minimal, "c"))
+    cache.store(bib_minimal, dict(foo="bar"))
+    assert cache.load(bib_minimal) is None
+
+    # Cache files that vanish while pruning, e.g. due to another process
+    monkeypatch.setattr(cache, 'CACHE_DIR', cache_dir)
+    cache.store(bib_minimal, dict(foo="bar"))
+    gone = os.path.join(cache.CACHE_DIR, "gone" + cache.CACHE_EXT)
+    monkeypatch.setattr(cache.glob, 'glob', lambda pattern: [gone])
+
+    cache.prune(0)
+    cache.clear()
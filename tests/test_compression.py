@@ -0,0 +1,44 @@
+"""Test the compression module"""
+
+import gzip
+import lzma
+
+import pytest
+
+from citationweb.compression import detect, open_stream
+
+# Tests -----------------------------------------------------------------------
+
+def test_detect(tmpdir):
+    """Test detecting compressed files by content and extension"""
+    plain = str(tmpdir.join("lib.bib"))
+    gz = str(tmpdir.join("lib.bib.gz"))
+    xz = str(tmpdir.join("lib.xz"))
+
+    with open(plain, 'wb') as f:
+        f.write(b"@misc{foo}\n")
+
+    with gzip.open(gz, 'wb') as f:
+        f.write(b"@misc{foo}\n")
+
+    with lzma.open(xz, 'wb') as f:
+        f.write(b"@misc{foo}\n")
+
+    assert detect(plain) is None
+    assert detect(gz) == 'gzip'
+    assert detect(xz) == 'xz'
+
+    # Missing files are detected by extension
+    assert detect(str(tmpdir.join("new.bib.XZ"))) == 'xz'
+    assert detect(str(tmpdir.join("new.bib")), mode='w') is None
+
+    # For reading, the content decides; for writing, the extension
+    assert detect(gz, mode='w') == 'gzip'
+    assert detect(plain + ".gz", mode='w') == 'gzip'
+
+    for path in (plain, gz, xz):
+        with open_stream(path) as f:
+            assert f.read() == b"@misc{foo}\n"
+
+    with pytest.raises(ValueError, match="Unsupported compression 'zip'"):
+        open_stream(plain, compression='zip')
@@ -0,0 +1,48 @@
+"""Test the entries module"""
+
+from pybtex.database import Entry, Person
+
+from citationweb.entries import LazyEntry, decode_latex
+
+# Tests -----------------------------------------------------------------------
+
+def test_decode_latex():
+    """Test decoding of LaTeX field values"""
+    assert decode_latex(r'Schr\"odinger') == "Schrödinger"
+    assert decode_latex(r'{The} {\"{a}} --- {B}') == "The ä — B"
+    assert decode_latex("plain") == "plain"
+
+def test_lazy_entry():
+    """Test the LazyEntry class"""
+    entry = LazyEntry('article', fields=dict(Title=r'{\"A}hnlich'))
+    entry.add_raw_persons('author', "Eigen, Manfred and Schuster, Peter")
+    entry.add_raw_persons('author', "Doe, John")
+
+    # Names are available without parsing
+    assert entry.person_names('Author') == ["Eigen, Manfred",
+                                            "Schuster, Peter", "Doe, John"]
+    assert entry.person_names('editor') == []
+
+    # Persons are parsed only on access
+    assert entry._raw_persons
+    assert [str(p) for p in entry.persons['author']] == ["Eigen, Manfred",
+                                                         "Schuster, Peter",
+                                                         "Doe, John"]
+    assert not entry._raw_persons
+
+    # Behaves like a regular entry
+    eager = Entry('article', fields=dict(Title=r'{\"A}hnlich'))
+    for name in ("Eigen, Manfred", "Schuster, Peter", "Doe, John"):
+        eager.add_person(Person(name), 'author')
+
+    assert entry == eager
+
+    entry.add_person(Person("Roe, Jane"), 'editor')
+    assert list(entry.persons.keys()) == ['author', 'editor']
+
+    # Decoded values are memoised, but updated if the field changes
+    assert entry.decoded('title') == "Ähnlich"
+    assert entry._decoded['title'] == (r'{\"A}hnlich', "Ähnlich")
+
+    entry.fields['Title'] = r'\"Ahnlicher'
+    assert entry.decoded('Title') == "Ähnlicher"
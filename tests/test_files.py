@@ -0,0 +1,76 @@
+"""Test the files module"""
+
+import base64
+import plistlib
+
+import pytest
+from pybtex.database import Entry
+
+from citationweb.files import LinkedFile, decode_bdsk_file, resolve_files
+
+# Fixtures --------------------------------------------------------------------
+
+def encode(plist: dict) -> str:
+    """Encodes a property list like BibDesk does for linked files"""
+    return base64.b64encode(plistlib.dumps(plist, fmt=plistlib.FMT_BINARY)
+                            ).decode('ascii')
+
+def keyed_archive(path: str) -> dict:
+    """Returns a keyed archive holding the given relative path"""
+    return {'$archiver': 'NSKeyedArchiver', '$version': 100000,
+            '$top': {'root': plistlib.UID(1)},
+            '$objects': ['$null',
+                         {'relativePath': plistlib.UID(2),
+                          'bookmark': plistlib.UID(3)},
+                         path, b'bookmark']}
+
+# Tests -----------------------------------------------------------------------
+
+def test_decode_bdsk_file():
+    """Test decoding Bdsk-File-N values"""
+    plain = encode(dict(relativePath="papers/Eigen1971.pdf",
+                        aliasData=b'alias'))
+    assert decode_bdsk_file(plain) == "papers/Eigen1971.pdf"
+
+    archive = encode(keyed_archive("../Eigen1977.pdf"))
+    assert decode_bdsk_file(archive) == "../Eigen1977.pdf"
+
+    # Decoded values are cached
+    hits = decode_bdsk_file.cache_info().hits
+    decode_bdsk_file(plain)
+    assert decode_bdsk_file.cache_info().hits == hits + 1
+
+    # Invalid values
+    with pytest.raises(ValueError, match="Could not decode"):
+        decode_bdsk_file("not base64!")
+
+    with pytest.raises(ValueError, match="no relative path"):
+        decode_bdsk_file(encode(dict(aliasData=b'alias')))
+
+    with pytest.raises(ValueError, match="no relative path"):
+        decode_bdsk_file(encode({'$objects': ['$null'], '$top': {}}))
+
+def test_resolve_files(tmpdir):
+    """Test resolving the linked files of many entries"""
+    tmpdir.mkdir("papers").join("a.pdf").write("")
+    tmpdir.join("b.pdf").write("")
+
+    entries = dict(
+        A={'Bdsk-File-2': encode(dict(relativePath="b.pdf")),
+           'Bdsk-File-1': encode(keyed_archive("papers/a.pdf")),
+           'Bdsk-Url-1': "https://example.com"},
+        B={'Bdsk-File-1': encode(dict(relativePath="papers/missing.pdf")),
+           'bdsk-file-10': "invalid"},
+        C={'Title': "No files"})
+    entries = {k: Entry('article', fields=f) for k, f in entries.items()}
+
+    linked = resolve_files(entries, str(tmpdir), 'Bdsk-File-')
+
+    assert list(linked) == ['A', 'B']
+    assert linked['A'] == (
+        LinkedFile('Bdsk-File-1', str(tmpdir.join("papers", "a.pdf")), True),
+        LinkedFile('Bdsk-File-2', str(tmpdir.join("b.pdf")), True))
+    assert linked['B'] == (
+        LinkedFile('Bdsk-File-1', str(tmpdir.join("papers", "missing.pdf")),
+                   False),
+        LinkedFile('bdsk-file-10', None, False))
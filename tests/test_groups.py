@@ -0,0 +1,154 @@
+"""Test the groups module"""
+
+from pkg_resources import resource_filename
+
+import pytest
+from pybtex.database import parse_file
+
+from citationweb.groups import Condition, SmartGroup, SmartGroups, StaticGroups
+
+# Fixtures --------------------------------------------------------------------
+
+START_STR = '@comment{BibDesk Static Groups{'
+
+APPDX = """@comment{BibDesk Static Groups{
+<?xml version="1.0" encoding="UTF-8"?>
+<plist version="1.0">
+<array>
+    <dict>
+        <key>group name</key>
+        <string>Evolution</string>
+        <key>keys</key>
+        <string>Eigen1971,Eigen1977</string>
+    </dict>
+    <dict>
+        <key>group name</key>
+        <string>Hypercycles</string>
+        <key>keys</key>
+        <string>Eigen1977</string>
+    </dict>
+    <dict>
+        <key>group name</key>
+        <string>Empty</string>
+        <key>keys</key>
+        <string></string>
+    </dict>
+</array>
+</plist>
+}}
+"""
+
+SMART_APPDX = """@comment{BibDesk Smart Groups{
+<?xml version="1.0" encoding="UTF-8"?>
+<plist version="1.0">
+<array>
+    <dict>
+        <key>conditions</key>
+        <array>
+            <dict>
+                <key>comparison</key>
+                <integer>2</integer>
+                <key>key</key>
+                <string>Journal</string>
+                <key>value</key>
+                <string>naturwissenschaften</string>
+            </dict>
+            <dict>
+                <key>comparison</key>
+                <integer>7</integer>
+                <key>key</key>
+                <string>Year</string>
+                <key>value</key>
+                <string>1975</string>
+            </dict>
+        </array>
+        <key>conjunction</key>
+        <integer>0</integer>
+        <key>group name</key>
+        <string>Recent Naturwissenschaften</string>
+    </dict>
+</array>
+</plist>
+}}
+"""
+
+MACROS = resource_filename("tests", "libs/macros.bib")
+
+# Tests -----------------------------------------------------------------------
+
+def test_static_groups():
+    """Test parsing and indexing static groups"""
+    groups = StaticGroups.from_appdx(APPDX, START_STR)
+
+    assert list(groups) == ['Evolution', 'Hypercycles', 'Empty']
+    assert groups['Evolution'] == ('Eigen1971', 'Eigen1977')
+    assert groups['Empty'] == ()
+    assert groups.groups_of('eigen1977') == ('Evolution', 'Hypercycles')
+    assert groups.groups_of('Kauffman1993') == ()
+
+    # No static groups in the appendix
+    assert len(StaticGroups.from_appdx(None, START_STR)) == 0
+    assert len(StaticGroups.from_appdx("@comment{foo}", START_STR)) == 0
+
+    # Malformed property lists
+    with pytest.raises(ValueError, match="Unterminated"):
+        StaticGroups.from_appdx(APPDX.replace('</plist>', ''), START_STR)
+
+    with pytest.raises(ValueError, match="Malformed"):
+        StaticGroups.from_appdx(APPDX.replace('</array>', ''), START_STR)
+
+def test_smart_groups():
+    """Test parsing and evaluating smart groups"""
+    entries = parse_file(MACROS).entries
+
+    groups = SmartGroups.from_appdx(SMART_APPDX,
+                                    '@comment{BibDesk Smart Groups{')
+    assert list(groups) == ['Recent Naturwissenschaften']
+    assert groups['Recent Naturwissenschaften'].conditions[1] == Condition(
+        field='Year', comparison=7, value='1975')
+    assert groups.evaluate(entries) == {
+        'Recent Naturwissenschaften': ('Eigen1977',)}
+
+    # Evaluate all kinds of comparisons and conjunctions
+    def group(name, conjunction, *conditions):
+        return SmartGroup(name, conjunction,
+                          tuple(Condition(*cond) for cond in conditions))
+
+    groups = SmartGroups([
+        group('contains', 0, ('Title', 0, 'ORDER')),
+        group('not contains', 0, ('title', 1, 'order')),
+        group('is', 0, ('Cite Key', 2, 'eigen1971')),
+        group('is not', 0, ('BibTeX Type', 3, 'article')),
+        group('starts', 0, ('author', 4, 'eigen')),
+        group('ends', 0, ('author', 5, 'schuster, peter')),
+        group('smaller', 0, ('year', 6, '1977')),
+        group('or', 1, ('year', 6, '1977'), ('author', 0, 'kauffman')),
+        group('missing', 0, ('doi', 2, '')),
+        group('all', 0),
+    ])
+    members = groups.evaluate(entries)
+
+    assert members['contains'] == ('Kauffman1993',)
+    assert members['not contains'] == ('Eigen1971', 'Eigen1977')
+    assert members['is'] == ('Eigen1971',)
+    assert members['is not'] == ('Kauffman1993',)
+    assert members['starts'] == ('Eigen1971', 'Eigen1977')
+    assert members['ends'] == ('Eigen1977',)
+    assert members['smaller'] == ('Eigen1971',)
+    assert members['or'] == ('Eigen1971', 'Kauffman1993')
+    assert members['missing'] == ('Eigen1977', 'Kauffman1993')
+    assert members['all'] == ('Eigen1971', 'Eigen1977', 'Kauffman1993')
+
+    # Groups that cannot be evaluated are skipped, without affecting others
+    with pytest.warns(UserWarning, match="Skipping smart group"):
+        groups = SmartGroups([group('foo', 0, ('title', 42, 'bar')),
+                              group('bar', 2),
+                              group('added', 0, ('Date-Added', 5, '')),
+                              group('all', 0)])
+
+    assert list(groups) == ['all']
+    assert list(groups.skipped) == ['foo', 'bar', 'added']
+    assert "comparison 42" in groups.skipped['foo']
+    assert "conjunction 2" in groups.skipped['bar']
+    assert "'Date-Added'" in groups.skipped['added']
+    assert groups.evaluate(dict())['all'] == ()
@@ -0,0 +1,50 @@
+"""Test that importing the package and starting the CLI is cheap"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import citationweb
+
+# Fixtures --------------------------------------------------------------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported before they are needed
+HEAVY_MODULES = ('pkg_resources', 'pybtex', 'yaml', 'latexcodec', 'PyPDF2',
+                 'matplotlib', 'concurrent.futures')
+
+def imported_modules(*args) -> set:
+    """Runs python with the given arguments and returns the names of the
+    modules it imported, as reported by -X importtime"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + list(args),
+                          cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+
+    return set(line.split('|')[-1].strip()
+               for line in proc.stderr.splitlines()
+               if line.startswith('import time:'))
+
+# Tests -----------------------------------------------------------------------
+
+@pytest.mark.parametrize('args', [('-c', 'import citationweb'),
+                                  ('cli/cweb', '--help')])
+def test_import_time(args):
+    """Test that no heavy dependencies are imported eagerly"""
+    modules = imported_modules(*args)
+    assert 'citationweb' in modules
+
+    for name in HEAVY_MODULES:
+        assert name not in modules
+
+def test_lazy_attributes():
+    """Test that the Bibliography class is available from the package"""
+    from citationweb.bibliography import Bibliography
+    assert citationweb.Bibliography is Bibliography
+
+    with pytest.raises(AttributeError, match="no attribute 'foo'"):
+        citationweb.foo
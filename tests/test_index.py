@@ -0,0 +1,115 @@
+"""Test the EntryIndex class"""
+
+import copy
+import os
+
+import pytest
+from pybtex.database import parse_file
+
+from citationweb import cache
+from citationweb.index import EntryIndex
+from citationweb.writing import splice_file
+
+# Tests -----------------------------------------------------------------------
+
+def test_index(bib_macros):
+    """Test building the index and parsing single entries"""
+    index = EntryIndex(bib_macros)
+    data = parse_file(bib_macros)
+
+    assert list(index) == list(data.entries.keys())
+    assert len(index) == 3
+    assert 'Eigen1977' in index
+    assert 'eigen1977' in index
+    assert 'foo' not in index
+
+    with open(bib_macros, 'rb') as f:
+        content = f.read()
+
+    for key, entry in data.entries.items():
+        start, length = index[key]
+        assert content[start:start + length].startswith(b'@')
+        assert index.parse(key) == entry
+
+    with pytest.raises(KeyError):
+        index.parse('foo')
+
+def test_persistence(bib_macros, cache_dir, monkeypatch):
+    """Test that the index is persisted and rebuilt only on changes"""
+    # By default, nothing is persisted
+    index = EntryIndex(bib_macros)
+    assert not os.path.exists(index.path)
+
+    index = EntryIndex(bib_macros, persist=True)
+    assert os.path.isfile(index.path)
+    assert os.path.dirname(index.path) == cache_dir
+    assert index.is_valid
+    assert not index.update()
+
+    # A new index loads the persisted one
+    assert not EntryIndex(bib_macros, persist=True).update()
+    assert EntryIndex(bib_macros, persist=True).comments == index.comments
+
+    # Changing the file invalidates the index
+    with open(bib_macros, 'a') as f:
+        f.write("\n@misc{Foo, Title = {Bar}}\n")
+
+    assert not index.is_valid
+    assert index.update()
+    assert index.parse('Foo').fields['Title'] == "Bar"
+
+    # Corrupt index files are ignored
+    with open(index.path, 'wb') as f:
+        f.write(b"foo")
+
+    assert EntryIndex(bib_macros, persist=True).parse('Foo')
+
+    # Failing to store the index is not an error
+    monkeypatch.setattr(cache, 'CACHE_DIR', os.path.join(bib_macros, "foo"))
+    assert 'Foo' in EntryIndex(bib_macros, persist=True)
+
+def test_diff(bib_macros):
+    """Test comparing two states of the index"""
+    index = EntryIndex(bib_macros)
+    old = copy.copy(index)
+    assert index.diff(old) == ([], [], [])
+
+    with open(bib_macros) as f:
+        content = f.read()
+
+    content = content.replace("Year = 1977", "Year = 1978")
+    content = content.replace("@book{Kauffman1993", "@book{Foo")
+    with open(bib_macros, 'w') as f:
+        f.write(content)
+
+    index.update()
+    assert index.diff(old) == (['Foo'], ['Eigen1977'], ['Kauffman1993'])
+    assert index.fingerprint('Eigen1971') == old.fingerprint('Eigen1971')
+    assert index.globals_fingerprint == old.globals_fingerprint
+
+def test_splice(bib_macros):
+    """Test deriving the index of an edited file from the edits"""
+    index = EntryIndex(bib_macros)
+    old = copy.copy(index)
+
+    # Replace an entry with a longer one, remove another and add two more
+    start, length = index['Eigen1977']
+    edits = [(start, start + length, "@misc{Eigen1977,\n  Title = {Ä}\n}"),
+             (index['Kauffman1993'][0], sum(index['Kauffman1993']), ""),
+             (index.entries_end, index.entries_end,
+              "\n\n@misc{Foo, Title = {Bar}}\n@comment{Baz}")]
+
+    splice_file(bib_macros, bib_macros, edits)
+    spliced = index.splice(edits)
+
+    assert spliced.is_valid
+    assert spliced.dump() == EntryIndex(bib_macros).dump()
+    assert spliced.diff(old) == (['Foo'], ['Eigen1977'], ['Kauffman1993'])
+    assert spliced.parse('Eigen1977').fields['Title'] == "Ä"
+
+    # The index itself is left unchanged
+    assert index.dump() == old.dump()
+
+    # Macros cannot be spliced in
+    with pytest.raises(ValueError, match="Cannot splice"):
+        spliced.splice([(0, 0, "@string{foo = {bar}}")])
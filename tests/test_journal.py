@@ -0,0 +1,89 @@
+"""Test the journal module"""
+
+import pickle
+
+import pytest
+from pybtex.database import Entry
+from pybtex.utils import OrderedCaseInsensitiveDict
+
+from citationweb.journal import (Change, ChangeJournal, TrackedEntries,
+                                 TrackedFields, track)
+
+# Tests -----------------------------------------------------------------------
+
+def test_change_journal():
+    """Test the ChangeJournal class"""
+    journal = ChangeJournal()
+    assert journal.seq == 0
+    assert journal.dirty == []
+
+    journal.record('set_field', 'Eigen1971', field='Year')
+    journal.record('add_entry', 'Kauffman1993')
+    seq = journal.seq
+    journal.record('del_field', 'eigen1971', field='Doi')
+
+    assert len(journal) == 3
+    assert journal.dirty == ['Eigen1971', 'Kauffman1993']
+    assert journal.is_dirty('EIGEN1971')
+    assert not journal.is_dirty('foo')
+
+    # Query the changes
+    assert journal.changes(since=seq) == [Change(2, 'del_field', 'eigen1971',
+                                                 'Doi')]
+    assert [c.seq for c in journal.changes(key='Eigen1971')] == [0, 2]
+    assert [c.key for c in journal.changes(op='add_entry')] == [
+        'Kauffman1993']
+    assert journal.dirty_since(1) == ['Kauffman1993', 'eigen1971']
+
+    # Cleaning keeps the changes
+    journal.clean(['kauffman1993'])
+    assert journal.dirty == ['Eigen1971']
+    journal.clean()
+    assert journal.dirty == []
+    assert len(journal) == 3
+
+    # Nothing is recorded while paused
+    with journal.paused():
+        journal.record('mark', 'foo')
+
+    assert journal.seq == 3
+
+    with pytest.raises(ValueError, match="Invalid operation 'foo'"):
+        journal.record('foo', 'bar')
+
+def test_tracking():
+    """Test tracking modifications of entries and their fields"""
+    journal = ChangeJournal()
+    entries = OrderedCaseInsensitiveDict(
+        Kauffman1993=Entry('book', fields=dict(Title="Order")))
+    fields = entries['Kauffman1993'].fields
+
+    entries = track(entries, journal)
+    assert isinstance(entries, TrackedEntries)
+    assert entries['Kauffman1993'].fields is fields
+    assert isinstance(fields, TrackedFields)
+
+    fields['Year'] = "1993"
+    del fields['title']
+    entries['Eigen1971'] = Entry('article', fields=dict(Year="1971"))
+    entries['Eigen1971'].fields['Year'] = "1972"
+    entries['kauffman1993'] = Entry('book')
+    del entries['Eigen1971']
+
+    assert [(c.op, c.key, c.field) for c in journal.changes()] == [
+        ('set_field', 'Kauffman1993', 'Year'),
+        ('del_field', 'Kauffman1993', 'title'),
+        ('add_entry', 'Eigen1971', None),
+        ('set_field', 'Eigen1971', 'Year'),
+        ('set_entry', 'kauffman1993', None),
+        ('remove_entry', 'Eigen1971', None)]
+
+    # Reading is not recorded
+    assert entries['Kauffman1993'].fields == dict()
+    assert journal.seq == 6
+
+    # Tracked containers are pickled as regular ones
+    restored = pickle.loads(pickle.dumps(entries))
+    assert type(restored) is OrderedCaseInsensitiveDict
+    assert type(restored['Kauffman1993'].fields) is OrderedCaseInsensitiveDict
+    assert restored == entries
@@ -0,0 +1,178 @@
+"""Test the parsing module"""
+
+import gzip
+from pkg_resources import resource_filename
+
+from pybtex.database import parse_file
+
+from citationweb.parsing import (EntryParser, extract_appdx, iter_blocks,
+                                 iter_entries, iter_lines, open_buffer,
+                                 parse_buffer, parse_parallel, read_ends)
+
+# Fixtures --------------------------------------------------------------------
+
+BIBDESK = resource_filename("tests", "libs/bibdesk.bib")
+MACROS = resource_filename("tests", "libs/macros.bib")
+MINIMAL = resource_filename("tests", "libs/minimal.bib")
+
+# Tests -----------------------------------------------------------------------
+
+def test_iter_blocks():
+    """Test splitting a file into its top-level blocks"""
+    with open(BIBDESK, 'rb') as f:
+        content = f.read()
+        f.seek(0)
+        blocks = list(iter_blocks(f))
+
+    assert [b.kind for b in blocks] == ['article', 'comment', 'comment']
+    assert [b.key for b in blocks] == ['Eigen1971', None, None]
+
+    # The offsets point to the raw bytes of the blocks
+    for block in blocks:
+        assert content[block.start:block.end] == block.raw
+        assert block.raw.startswith(b'@')
+        assert block.raw.endswith(b'}')
+
+    # Different delimiters and several blocks on the same line
+    with open(MACROS, 'rb') as f:
+        blocks = list(iter_blocks(f))
+
+    assert [b.kind for b in blocks] == ['string', 'preamble',
+                                        'article', 'article', 'book']
+    assert [b.key for b in blocks][2:] == ['Eigen1971', 'Eigen1977',
+                                           'Kauffman1993']
+    assert blocks[3].raw.endswith(b')')
+
+    # Closing parentheses within quoted values do not end a block
+    content = (b'@article(A, title = "x ) y",\n  note = "multi\n ) line")\n'
+               b'@article(B, title = {")"}, note = "z")\n')
+    blocks = list(iter_blocks(iter_lines(content)))
+
+    assert [b.key for b in blocks] == ['A', 'B']
+    assert blocks[0].raw == content[:content.index(b'\n@')]
+    assert blocks[1].raw.endswith(b'"z")')
+
+def test_iter_entries():
+    """Test that iterating over the entries yields the same as pybtex"""
+    for path in (BIBDESK, MACROS):
+        with open(path, 'rb') as f:
+            entries = list(iter_entries(f))
+
+        assert entries == list(parse_file(path).entries.items())
+
+    # Macros are resolved
+    assert entries[0][1].fields['Journal'] == "Naturwissenschaften"
+
+    # Quoted values may hold the closing delimiter
+    content = b'@article(A, title = "x ) y")\n'
+    entries = list(iter_entries(iter_lines(content)))
+    assert entries[0][1].fields['Title'] == "x ) y"
+
+def test_parse_parallel():
+    """Test parsing a file in parallel chunks"""
+    # Use tiny chunks such that each block ends up in its own chunk and the
+    # macros need to be carried over to the later chunks
+    with open(MACROS, 'rb') as f:
+        data = parse_parallel(f.read(), workers=2, chunk_size=1)
+
+    assert data == parse_file(MACROS)
+    assert list(data.entries.keys()) == ['Eigen1971', 'Eigen1977',
+                                         'Kauffman1993']
+    assert data.entries['Eigen1977'].fields['Journal'] == "Naturwissenschaften"
+
+def test_buffer():
+    """Test reading and parsing from a memory-mapped buffer"""
+    with open_buffer(MACROS) as buf:
+        with open(MACROS, 'rb') as f:
+            assert list(iter_lines(buf)) == f.readlines()
+
+        assert parse_buffer(buf) == parse_file(MACROS)
+
+    assert list(iter_lines(b'foo\nbar')) == [b'foo\n', b'bar']
+    assert list(iter_lines(b'')) == []
+
+def test_read_ends(tmpdir):
+    """Test reading the start and end of a file"""
+    with open(BIBDESK, 'rb') as f:
+        content = f.read()
+
+    assert read_ends(BIBDESK, 16) == (content[:16], content[-16:])
+    assert read_ends(BIBDESK, len(content) + 1) == (content, content)
+
+    path = str(tmpdir.join("bibdesk.bib.gz"))
+    with gzip.open(path, 'wb') as f:
+        f.write(content)
+
+    assert read_ends(path, 16) == (content[:16], content[-16:])
+    assert read_ends(path, 1000) == (content[:1000], content[-1000:])
+
+def test_extract_appdx():
+    """Test extracting the appendix from a buffer"""
+    with open_buffer(BIBDESK) as buf:
+        appdx = extract_appdx(buf, '@comment{BibDesk')
+
+    assert appdx.startswith('@comment{BibDesk Static Groups{\n')
+    assert appdx.endswith('</plist>\n}}\n')
+
+    with open_buffer(MINIMAL) as buf:
+        assert extract_appdx(buf, '@comment{BibDesk') == ''
+
+    assert extract_appdx(b'@comment{foo}', '@comment') == '@comment{foo}'
+
+def test_extract_appdx_blocks():
+    """Test that the appendix comprises all its blocks at the end"""
+    buf = (b'@article{Foo,\n    Title = {Bar}\n}\n\n'
+           b'@comment{BibDesk Static Groups{\n<plist/>\n}}\n\n'
+           b'@comment{BibDesk Smart Groups{\n<plist/>\n}}\n')
+
+    appdx = extract_appdx(buf, '@comment{BibDesk')
+    assert appdx == buf[buf.index(b'@comment'):].decode()
+
+    # Works with the start string at the beginning of the file as well
+    assert extract_appdx(buf[buf.index(b'@comment'):],
+                         '@comment{BibDesk') == appdx
+
+    # Blocks not at the end of the file are not part of the appendix
+    buf = (b'@comment{BibDesk Static Groups{\n<plist/>\n}}\n\n'
+           b'@article{Foo,\n    Title = {Bar}\n}\n')
+    assert extract_appdx(buf, '@comment{BibDesk') == ''
+
+def test_fast_parser():
+    """Test that the fast tokenizer yields the same entries as pybtex"""
+    for path in (BIBDESK, MACROS, MINIMAL):
+        with open(path) as f:
+            text = f.read()
+
+        assert (EntryParser(fast=True).parse_string(text)
+                == EntryParser().parse_string(text))
+
+    text = ("%% Some comment\n\n"
+            "@article{Closed,\n"
+            "\tAuthor = {Doe, John and {Roe and Sons}},\n"
+            "\tTitle = {The {Title} with {{nested}} braces},\n"
+            "\tYear = {2001}}\n\n"
+            "@book{Macro,\n"
+            "\tMonth = jan,\n"
+            "\tTitle = {Ignored {by} the fast tokenizer}\n"
+            "}\n\n"
+            "@misc{Multiline,\n"
+            "\tAbstract = {Spans\n"
+            "@several lines},\n"
+            "\tTitle = {Concatenated} # {strings}}\n\n"
+            "@misc{Last,\n"
+            "    Note = {No trailing comma}\n"
+            "}\n"
+            "% A trailing comment\n")
+
+    fast = EntryParser(fast=True).parse_string(text)
+    assert fast == EntryParser().parse_string(text)
+    assert list(fast.entries.keys()) == ['Closed', 'Macro', 'Multiline',
+                                         'Last']
+    assert fast.entries['Macro'].fields['Month'] == "January"
+    assert fast.entries['Multiline'].fields['Title'] == "Concatenatedstrings"
+
+    # Works together with the other options
+    kwargs = dict(lazy_fields=True, fields=['author', 'year'],
+                  where=lambda e: 'year' in e.fields)
+    assert (EntryParser(fast=True, **kwargs).parse_string(text)
+            == EntryParser(**kwargs).parse_string(text))
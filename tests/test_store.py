@@ -0,0 +1,113 @@
+"""Test the store module"""
+
+import pickle
+from pkg_resources import resource_filename
+
+import pytest
+from pybtex.database import Entry, parse_file
+from pybtex.database import BibliographyDataError
+
+from citationweb.store import CompactData, StringTable, intern_entry
+
+# Fixtures --------------------------------------------------------------------
+
+MACROS = resource_filename("tests", "libs/macros.bib")
+
+# Tests -----------------------------------------------------------------------
+
+def test_string_table():
+    """Test the StringTable class"""
+    table = StringTable()
+    assert table.intern("foo") == 0
+    assert table.intern("bar") == 1
+    assert table.intern("foo") == 0
+    assert table[1] == "bar"
+    assert table.id("bar") == 1
+    assert "foo" in table
+    assert "baz" not in table
+    assert len(table) == 2
+
+    with pytest.raises(KeyError):
+        table.id("baz")
+
+    restored = pickle.loads(pickle.dumps(table))
+    assert restored.id("bar") == 1
+
+def test_compact_data():
+    """Test the CompactData class and its views"""
+    bib_data = parse_file(MACROS)
+    data = CompactData.from_entries(bib_data.entries.items())
+
+    assert data == bib_data
+    assert list(data.entries) == list(bib_data.entries)
+    assert len(data.entries) == 3
+    assert 'eigen1977' in data.entries
+
+    entry = data.entries['Eigen1977']
+    original = bib_data.entries['Eigen1977']
+    assert entry == original
+    assert entry.key == 'Eigen1977'
+    assert entry.type == 'article'
+    assert entry.fields['journal'] == "Naturwissenschaften"
+    assert dict(entry.fields) == dict(original.fields)
+    assert len(entry.fields) == 3
+    assert entry.persons == original.persons
+    assert 'Eigen1977' in repr(entry)
+
+    with pytest.raises(KeyError):
+        entry.fields['foo']
+
+    # The views are read-only
+    with pytest.raises(TypeError):
+        entry.fields['Year'] = "2000"
+
+    with pytest.raises(TypeError):
+        data.entries['foo'] = entry
+
+    # Strings are stored only once
+    strings = [data.strings[i] for i in range(len(data.strings))]
+    assert strings.count("Naturwissenschaften") == 1
+
+    # Survives pickling
+    assert pickle.loads(pickle.dumps(data)) == bib_data
+
+    # Repeated entries are errors, as in pybtex
+    with pytest.raises(BibliographyDataError, match="repeated"):
+        data.add_entry('eigen1977', original)
+
+    # Person names are available without parsing
+    assert entry.person_names('author') == ["Eigen, Manfred",
+                                            "Schuster, Peter"]
+
+def test_intern_entry():
+    """Test the interning of entry values"""
+    bib_data = parse_file(MACROS)
+    strings = StringTable()
+
+    ids = [intern_entry(strings, entry, fields=('journal', 'keywords'),
+                        persons=('author',), separators=dict(keywords=','),
+                        replace=True)
+           for entry in bib_data.entries.values()]
+
+    # Equal values have equal ids
+    assert ids[0]['journal'] == ids[1]['journal']
+    assert strings[ids[0]['journal'][0]] == "Naturwissenschaften"
+    assert ids[0]['author'] == ids[1]['author'][:1]
+    assert [strings[i] for i in ids[1]['author']] == ["Eigen, Manfred",
+                                                      "Schuster, Peter"]
+    assert 'journal' not in ids[2]
+
+    # The interned strings replace the values
+    eigen1971, eigen1977 = list(bib_data.entries.values())[:2]
+    assert eigen1971.fields['journal'] is eigen1977.fields['journal']
+    assert list(eigen1971.fields) == ['Doi', 'Journal', 'Title', 'Year']
+
+    # Lists of values are interned separately
+    entry = Entry('article', fields=dict(Keywords="Evolution, Networks"))
+    ids = intern_entry(strings, entry, fields=('keywords',),
+                       separators=dict(keywords=','), replace=True)
+    assert [strings[i] for i in ids['keywords']] == ["Evolution", "Networks"]
+
+    # ... and only these are interned
+    assert "Evolution, Networks" not in strings
+    assert entry.fields['Keywords'] == "Evolution, Networks"
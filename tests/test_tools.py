@@ -0,0 +1,112 @@
+"""Test the tools module"""
+
+import json
+import os
+
+import pytest
+
+from citationweb import tools
+from citationweb.tools import compile_cfg, load_cfg, reload_cfg
+
+# Tests -----------------------------------------------------------------------
+
+def test_load_cfg():
+    """Test loading the config once and handing out read-only views"""
+    cfg = load_cfg('citationweb.writing')
+    assert cfg['indent'] == '    '
+    assert dict(load_cfg()['writing']) == dict(cfg)
+
+    # Sub-sections and lists are read-only, too
+    interning = load_cfg('citationweb.bibliography')['interning']
+    assert isinstance(interning['fields'], tuple)
+
+    with pytest.raises(TypeError):
+        cfg['indent'] = '\t'
+
+    with pytest.raises(TypeError):
+        interning['separators']['keywords'] = ';'
+
+    # The file is read only once
+    assert tools._get_cfg() is tools._get_cfg()
+
+    with pytest.raises(KeyError):
+        load_cfg('citationweb.nonexistent')
+
+def test_reload_cfg(tmpdir, monkeypatch):
+    """Test reloading the config explicitly"""
+    cfg = load_cfg('citationweb.writing')
+
+    path = tmpdir.join("cfg.yml")
+    path.write("writing:\n  indent: \"\\t\"\n")
+    monkeypatch.setattr(tools, 'CFG_PATH', str(path))
+
+    # Views reflect the reloaded config
+    assert cfg['indent'] == '    '
+
+    try:
+        reload_cfg()
+        assert cfg['indent'] == '\t'
+
+    finally:
+        monkeypatch.undo()
+        reload_cfg()
+
+    assert cfg['indent'] == '    '
+
+def test_cfg_snapshot(tmpdir, monkeypatch):
+    """Test compiling the config into a snapshot and loading it"""
+    cfg_path = tmpdir.join("cfg.yml")
+    cfg_path.write("writing:\n  indent: \"\\t\"\n  buffer_size: 4\n")
+    user_path = tmpdir.join("user.yml")
+    snapshot = str(tmpdir.join("cfg.json"))
+
+    monkeypatch.setattr(tools, 'CFG_PATH', str(cfg_path))
+    monkeypatch.setattr(tools, 'USER_CFG_PATH', str(user_path))
+    monkeypatch.setattr(tools, 'SNAPSHOT_PATH', snapshot)
+
+    try:
+        assert compile_cfg() == snapshot
+        with open(snapshot) as f:
+            assert json.load(f)['cfg'] == tools._parse_cfg()
+
+        # An up-to-date snapshot is used instead of the YAML file, regardless
+        # of the modification times
+        with open(snapshot, 'w') as f:
+            json.dump(dict(sources=tools._source_digests(),
+                           cfg=dict(writing=dict(indent="x"))), f)
+
+        mtime = os.stat(snapshot).st_mtime
+        os.utime(str(cfg_path), (mtime + 1, mtime + 1))
+        reload_cfg()
+        assert load_cfg('citationweb.writing')['indent'] == "x"
+
+        # ... but not if the YAML file changed, even if it seems older
+        cfg_path.write("writing:\n  indent: \"\\t\"\n  buffer_size: 4\n\n")
+        os.utime(str(cfg_path), (mtime - 1, mtime - 1))
+        reload_cfg()
+        assert load_cfg('citationweb.writing')['indent'] == "\t"
+
+        # User config updates the config, and a snapshot compiled without it
+        # is not used
+        compile_cfg()
+        user_path.write("writing:\n  indent: '  '\n")
+        os.utime(str(user_path), (mtime - 1, mtime - 1))
+        reload_cfg()
+        assert dict(load_cfg('citationweb.writing')) == dict(indent='  ',
+                                                             buffer_size=4)
+
+        compile_cfg()
+        with open(snapshot) as f:
+            assert json.load(f)['sources'] == tools._source_digests()
+
+        reload_cfg()
+        assert load_cfg('citationweb.writing')['indent'] == '  '
+
+        # Values that JSON does not support cannot be compiled
+        cfg_path.write("writing:\n  1: foo\n")
+        with pytest.raises(ValueError, match="cannot be stored as a JSON"):
+            compile_cfg()
+
+    finally:
+        monkeypatch.undo()
+        reload_cfg()
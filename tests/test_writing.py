@@ -0,0 +1,168 @@
+"""Test the writing module"""
+
+import gzip
+import os
+from pkg_resources import resource_filename
+
+import pytest
+from pybtex.database import Entry, Person, parse_file
+
+from citationweb.entries import LazyEntry
+from citationweb import writing
+from citationweb.writing import (atomic_open, copy_range, format_entry,
+                                 splice_file, write_bibfile)
+
+# Fixtures --------------------------------------------------------------------
+
+MACROS = resource_filename("tests", "libs/macros.bib")
+
+# Tests -----------------------------------------------------------------------
+
+def test_atomic_open(tmpdir):
+    """Test writing files atomically"""
+    path = str(tmpdir.join("out.bib"))
+
+    with atomic_open(path) as f:
+        f.write("foo\n")
+
+    with open(path) as f:
+        assert f.read() == "foo\n"
+
+    # On errors, the file is untouched and no temporary file is left
+    with pytest.raises(RuntimeError):
+        with atomic_open(path) as f:
+            f.write("bar\n")
+            raise RuntimeError()
+
+    with open(path) as f:
+        assert f.read() == "foo\n"
+
+    assert os.listdir(str(tmpdir)) == ["out.bib"]
+
+    # Permissions of the replaced file are kept
+    os.chmod(path, 0o640)
+    with atomic_open(path, mode='wb') as f:
+        f.write(b"baz\n")
+
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    # Symlinks are kept, replacing the file they point to
+    link = str(tmpdir.join("link.bib"))
+    os.symlink(path, link)
+
+    with atomic_open(link) as f:
+        f.write("qux\n")
+
+    assert os.path.islink(link)
+    with open(path) as f:
+        assert f.read() == "qux\n"
+
+def test_format_entry():
+    """Test formatting single entries"""
+    entry = Entry('Article', fields=dict(Title="The {Hypercycle}",
+                                         Year="1977"))
+    entry.add_person(Person("Eigen, Manfred"), 'Author')
+    entry.add_person(Person("Schuster, Peter"), 'Author')
+
+    assert format_entry('Eigen1977', entry, indent='\t') == (
+        "@Article{Eigen1977,\n"
+        "\tAuthor = {Eigen, Manfred and Schuster, Peter},\n"
+        "\tTitle = {The {Hypercycle}},\n"
+        "\tYear = {1977}\n"
+        "}\n")
+
+    # Sorted fields; raw person fields are not parsed
+    entry = LazyEntry('book', fields=dict(Year="1993", Title="Order"))
+    entry.add_raw_persons('editor', "Doe, John")
+    formatted = format_entry('Doe1993', entry, sort_fields=True, indent='  ')
+
+    assert formatted == ("@book{Doe1993,\n"
+                         "  editor = {Doe, John},\n"
+                         "  Title = {Order},\n"
+                         "  Year = {1993}\n"
+                         "}\n")
+    assert entry._raw_persons
+
+    # Entries without fields
+    assert format_entry('foo', Entry('misc')) == "@misc{foo,\n}\n"
+
+def test_write_bibfile(tmpdir):
+    """Test writing whole files"""
+    data = parse_file(MACROS)
+    path = str(tmpdir.join("out.bib"))
+
+    write_bibfile(path, data.entries, preamble=data.preamble,
+                  appdx="@comment{Appendix}\n")
+
+    assert parse_file(path) == data
+
+    with open(path) as f:
+        content = f.read()
+
+    assert content.startswith('@preamble{{\\newcommand{\\noop}[1]{}}}\n\n')
+    assert content.endswith("}\n\n@comment{Appendix}\n")
+
+@pytest.mark.parametrize('zero_copy', [True, False])
+def test_copy_range(tmpdir, monkeypatch, zero_copy):
+    """Test copying byte ranges between files, with and without support for
+    copying within the kernel"""
+    if not zero_copy:
+        def unsupported(*args):
+            raise OSError("Not supported")
+
+        monkeypatch.setattr(writing, '_zero_copy', unsupported)
+
+    monkeypatch.setattr(writing, 'cfg', dict(writing.cfg, buffer_size=4))
+
+    src = tmpdir.join("src")
+    src.write_binary(b"0123456789")
+    dst = str(tmpdir.join("dst"))
+
+    with open(str(src), 'rb') as s, open(dst, 'wb') as d:
+        copy_range(s.fileno(), d.fileno(), 2, 7)
+        copy_range(s.fileno(), d.fileno(), 0, 1)
+
+        with pytest.raises(EOFError, match="3 bytes before"):
+            copy_range(s.fileno(), d.fileno(), 9, 4)
+
+    with open(dst, 'rb') as f:
+        assert f.read() == b"23456780" + b"9"
+
+def test_splice_file(tmpdir):
+    """Test writing a file by replacing byte ranges of another one"""
+    src = tmpdir.join("src")
+    src.write_binary(b"@a{A}\n\n@b{B}\n\n@c{C}\n")
+    path = str(tmpdir.join("out"))
+
+    splice_file(path, str(src), [(0, 0, "% Head\n"), (7, 12, "@b{Bä}"),
+                                 (14, 20, ""), (20, 20, "@d{D}\n")])
+
+    with open(path, 'rb') as f:
+        assert f.read() == ("% Head\n@a{A}\n\n@b{Bä}\n\n@d{D}\n"
+                            "".encode('utf-8'))
+
+    # In place and without edits
+    splice_file(str(src), str(src), [])
+    assert src.read_binary() == b"@a{A}\n\n@b{B}\n\n@c{C}\n"
+
+def test_compressed(tmpdir):
+    """Test writing and splicing compressed files"""
+    path = str(tmpdir.join("out.bib.gz"))
+
+    with atomic_open(path) as f:
+        f.write("foo bar\n")
+
+    with gzip.open(path, 'rb') as f:
+        assert f.read() == b"foo bar\n"
+
+    # Splicing decompresses the source and compresses by extension
+    splice_file(path, path, [(4, 7, "baz")])
+    with gzip.open(path, 'rb') as f:
+        assert f.read() == b"foo baz\n"
+
+    plain = str(tmpdir.join("out.bib"))
+    splice_file(plain, path, [(0, 0, "% ")])
+    with open(plain, 'rb') as f:
+        assert f.read() == b"% foo baz\n"
+
+    assert sorted(os.listdir(str(tmpdir))) == ["out.bib", "out.bib.gz"]